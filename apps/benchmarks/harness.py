@@ -0,0 +1,287 @@
+"""
+End-to-end benchmark of the apps against the local stand-in of their APIs
+(see mock_server.py).
+
+Each app runs in its own process, its script executed the way Streamlit
+runs it but without a server ("bare" mode): once cold, in a fresh process
+with empty schema and CoinGecko caches, then `--warm-runs` more times in the
+same process, as reruns do, so module-level caches carry over. Reported per app:
+cold and median warm render time, subgraph queries and CoinGecko calls per
+run, and peak RSS. Results are compared to the baseline and any regression
+makes the run fail, as does an app with no baseline recorded for the same
+settings.
+
+Query and call counts are deterministic against the stand-in, so they are
+committed in baseline.json (`--record` updates it) and a clean checkout is
+compared on them. Timings and memory depend on the machine: `--save-baseline`
+stores them in baseline.local.json, which is not committed, and later runs
+are compared on them too.
+
+    python harness.py
+    python harness.py --save-baseline
+    python harness.py --record
+    python harness.py --apps whale-watcher erc20-analytics --rows 20000 --latency-ms 100
+"""
+import argparse
+import json
+import os
+import resource
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import requests
+
+from mock_server import DEFAULT_OWNER_ROWS, DEFAULT_ROWS, MockServer, parse_entity_rows
+
+APPS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+LOCAL_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.local.json")
+
+APPS = {
+    "dex-dashboard": "dex-dashboard/app.py",
+    "makerdao-analytics": "makerdao-analytics/makerdao.py",
+    "whale-watcher": "whale-watcher/app.py",
+    "uniswap-analytics": "uniswap-analytics/app.py",
+    "curve-pool-depeg": "curve-pool-depeg/app.py",
+    "erc20-analytics": "erc20-analytics/app.py",
+}
+
+SUBGRAPH_HOST = "https://api.thegraph.com"
+COINGECKO_HOST = "https://api.coingecko.com"
+
+# Widgets returning something else than their default in bare mode, so the
+# app renders its data (curve-pool-depeg only queries once its form is sent)
+WIDGET_VALUES = {
+    "curve-pool-depeg": {"form_submit_button": True, "slider": 30},
+}
+
+DEFAULT_WARM_RUNS = 3
+
+# Relative increase over the baseline counted as a regression, provided it is
+# also above the absolute floor. Query counts are deterministic against the
+# stand-in, so any increase is one.
+TOLERANCES = {
+    "cold_ms": (0.25, 50),
+    "warm_ms": (0.25, 20),
+    "cold_queries": (0, 0),
+    "warm_queries": (0, 0),
+    "api_calls": (0, 0),
+    "peak_rss_mb": (0.15, 10),
+}
+
+# Metrics that do not depend on the machine, the ones committed
+COUNTS = ("cold_queries", "warm_queries", "api_calls")
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def redirect(server_url, counters):
+    """
+    Sends every request to the hosted APIs to the stand-in instead, counting
+    them per host.
+    """
+    send = requests.Session.request
+
+    def request(session, method, url, *args, **kwargs):
+        for host in (SUBGRAPH_HOST, COINGECKO_HOST):
+            if url.startswith(host):
+                counters[host] += 1
+                url = server_url + url[len(host):]
+        return send(session, method, url, *args, **kwargs)
+
+    requests.Session.request = request
+
+
+def set_widgets(values):
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+
+    for widget, value in values.items():
+        stub = lambda *args, _value=value, **kwargs: _value
+        setattr(DeltaGenerator, widget, stub)
+        setattr(st, widget, stub)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(app, server_url, warm_runs):
+    """
+    Runs the script of `app` cold then `warm_runs` times, in this process.
+    """
+    script = os.path.join(APPS_DIR, APPS[app])
+    os.chdir(os.path.dirname(script))
+    sys.path.insert(0, os.path.dirname(script))
+
+    counters = Counter()
+    redirect(server_url, counters)
+    set_widgets(WIDGET_VALUES.get(app, {}))
+
+    runs = []
+    for _ in range(1 + warm_runs):
+        counters.clear()
+        start = time.perf_counter()
+        runpy.run_path(script, run_name="__main__")
+        runs.append({
+            "ms": (time.perf_counter() - start) * 1000,
+            "queries": counters[SUBGRAPH_HOST],
+            "api_calls": counters[COINGECKO_HOST],
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+    print(RESULT_PREFIX + json.dumps(runs), flush=True)
+
+
+def summarize(runs):
+    cold, warm = runs[0], runs[1:] or runs[:1]
+    return {
+        "cold_ms": round(cold["ms"], 1),
+        "warm_ms": round(statistics.median(run["ms"] for run in warm), 1),
+        "cold_queries": cold["queries"],
+        "warm_queries": max(run["queries"] for run in warm),
+        "api_calls": cold["api_calls"],
+        "peak_rss_mb": round(max(run["peak_rss_mb"] for run in runs), 1),
+    }
+
+
+def benchmark(app, server_url, warm_runs, timeout):
+    """
+    Summary of the runs of `app` in a fresh process, or its error.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, SUBGRAPH_SCHEMA_CACHE_DIR=cache_dir, COINGECKO_CACHE_DIR=cache_dir)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", app, "--server", server_url, "--warm-runs", str(warm_runs)]
+        try:
+            process = subprocess.run(command, capture_output=True, text=True, env=env, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"error": f"timed out after {timeout}s"}
+
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return summarize(json.loads(line[len(RESULT_PREFIX):]))
+
+    lines = process.stderr.strip().splitlines()
+    return {"error": lines[-1] if lines else f"exited with {process.returncode}"}
+
+
+def regressions(results, baseline):
+    """
+    (app, metric, baseline value, value) of every metric over its tolerance.
+    """
+    found = []
+    for app, metrics in results.items():
+        reference = baseline.get(app)
+        if reference is None or "error" in reference:
+            continue
+        if "error" in metrics:
+            found.append((app, "error", None, metrics["error"]))
+            continue
+        for metric, (relative, floor) in TOLERANCES.items():
+            if metric not in reference:
+                continue
+            value, base = metrics[metric], reference[metric]
+            if value > base * (1 + relative) and value - base > floor:
+                found.append((app, metric, base, value))
+    return found
+
+
+def report(results, baseline):
+    columns = list(TOLERANCES)
+    print(f"{'app':<20}" + "".join(f"{column:>14}" for column in columns))
+    for app, metrics in results.items():
+        if "error" in metrics:
+            print(f"{app:<20}  error: {metrics['error']}")
+            continue
+        print(f"{app:<20}" + "".join(f"{metrics[column]:>14}" for column in columns))
+        if app in baseline and "error" not in baseline[app]:
+            print(f"{'  baseline':<20}" + "".join(f"{baseline[app].get(column, '-'):>14}" for column in columns))
+
+
+def load_baseline(path, settings):
+    """
+    Results stored in `path` per app, empty when there are none or they were
+    recorded with other settings.
+    """
+    try:
+        with open(path) as baseline_file:
+            stored = json.load(baseline_file)
+    except (OSError, ValueError):
+        return {}
+
+    if stored["settings"] != settings:
+        print(f"Baseline {path} recorded with other settings, not compared")
+        return {}
+    return stored["results"]
+
+
+def save_baseline(path, settings, results):
+    with open(path, "w") as baseline_file:
+        json.dump({"settings": settings, "results": results}, baseline_file, indent=2)
+        baseline_file.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="*", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per entity served")
+    parser.add_argument("--owner-rows", type=int, default=DEFAULT_OWNER_ROWS, help="Rows per entity having snapshots")
+    parser.add_argument("--entity-rows", nargs="*", metavar="ENTITY=ROWS", help="Row count overrides, e.g. Swap=100000")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--warm-runs", type=int, default=DEFAULT_WARM_RUNS)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per app")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Committed baseline of the query and call counts")
+    parser.add_argument("--local-baseline", default=LOCAL_BASELINE_PATH, help="Baseline of every metric on this machine")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new local baseline")
+    parser.add_argument("--record", action="store_true", help="Store the query and call counts as the new committed baseline")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.server, args.warm_runs)
+        return
+
+    settings = {"rows": args.rows, "owner_rows": args.owner_rows, "entity_rows": parse_entity_rows(args.entity_rows), "latency_ms": args.latency_ms, "warm_runs": args.warm_runs}
+    server = MockServer(**{key: value for key, value in settings.items() if key != "warm_runs"}).start()
+    try:
+        results = {app: benchmark(app, server.url, args.warm_runs, args.timeout) for app in args.apps}
+    finally:
+        server.stop()
+
+    committed = load_baseline(args.baseline, settings)
+    local = load_baseline(args.local_baseline, settings)
+    baseline = {app: {**committed.get(app, {}), **local.get(app, {})} for app in {*committed, *local}}
+    report(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.local_baseline, settings, {**local, **results})
+    if args.record:
+        counts = {
+            app: metrics if "error" in metrics else {metric: metrics[metric] for metric in COUNTS}
+            for app, metrics in results.items()
+        }
+        save_baseline(args.baseline, settings, {**committed, **counts})
+    if args.save_baseline or args.record:
+        return
+
+    found = regressions(results, baseline)
+    for app, metric, base, value in found:
+        print(f"REGRESSION {app} {metric}: {base} -> {value}")
+
+    # Nothing to compare to is not a pass
+    missing = [app for app in results if app not in baseline or "error" in baseline[app]]
+    for app in missing:
+        print(f"NO BASELINE {app}: run with --record or --save-baseline first")
+    sys.exit(1 if found or missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Micro-benchmarks of the data transforms the apps run on every refresh, on
+synthetic frames from 1e3 to 1e6 rows.
+
+The transforms are loaded from the app scripts without running them, so only
+pandas is needed. Each one is timed at every size (best of `--repeat` runs)
+and reported with its time per row and the scaling exponent from the previous
+size: about 1 for a linear transform, clearly above 1 for one that blows up as
+histories or pool counts grow. Sizes after one exceeding `--max-seconds` are
+skipped.
+
+    python transforms.py
+    python transforms.py --sizes 1000 100000 --only whale-watcher:format_swaps --json results.json
+"""
+import argparse
+import ast
+import json
+import math
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+APPS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_REPEAT = 3
+DEFAULT_MAX_SECONDS = 30
+
+
+def load(script, names, constants=()):
+    """
+    Namespace holding the functions `names` and the module-level `constants`
+    of an app script, defined without running the script. Imports the script
+    makes are attempted, unavailable ones (Streamlit, sibling modules) are
+    skipped, and decorators are dropped.
+    """
+    path = os.path.join(APPS_DIR, script)
+    with open(path) as source:
+        tree = ast.parse(source.read(), path)
+
+    namespace = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            try:
+                exec(compile(ast.Module([node], []), path, "exec"), namespace)
+            except ImportError:
+                pass
+        elif isinstance(node, ast.Assign) and any(getattr(target, "id", None) in constants for target in node.targets):
+            exec(compile(ast.Module([node], []), path, "exec"), namespace)
+        elif isinstance(node, ast.FunctionDef) and node.name in names:
+            node.decorator_list = []
+            exec(compile(ast.Module([node], []), path, "exec"), namespace)
+
+    missing = [name for name in (*names, *constants) if name not in namespace]
+    if missing:
+        raise NameError(f"{script} defines no {', '.join(missing)}")
+    return namespace
+
+
+def curve_pool_snapshots(rows, rng):
+    tokens = [f"TKN{i}" for i in range(20)]
+    decimals = {token: rng.choice([6, 8, 18]) for token in tokens}
+    names = [rng.sample(tokens, 3) for _ in range(rows)]
+    frame = pd.DataFrame({
+        "input_tokens_name": names,
+        "daily_input_tokens_weight": [[str(rng.random()) for _ in range(3)] for _ in range(rows)],
+        "daily_input_tokens_balance": [[str(rng.randrange(1, 10 ** 25)) for _ in range(3)] for _ in range(rows)],
+        "daily_tvl": [str(rng.uniform(1e5, 1e9)) for _ in range(rows)],
+    })
+    return frame, decimals
+
+
+def makerdao_markets(rows, rng):
+    uniswap = np.array([rng.random() < 0.1 for _ in range(rows)])
+    return pd.DataFrame({
+        "markets_name": np.where(uniswap, [f"UNIV2DAI{i % 40}-A" for i in range(rows)], [f"ETH-{i % 26}" for i in range(rows)]),
+        "markets_inputToken_name": np.where(uniswap, "Uniswap V2", "Token"),
+        "markets_inputToken_symbol": np.where(uniswap, "UNI-V2", [f"TKN{i % 50}" for i in range(rows)]),
+        "markets_inputToken_id": [f"0x{i % 50:040x}" for i in range(rows)],
+        "markets_totalValueLockedUSD": [rng.uniform(0, 1e8) for _ in range(rows)],
+    })
+
+
+def makerdao_financial_snapshots(rows, rng):
+    today = int(time.time()) // 86400
+    frame = pd.DataFrame({
+        "financialsDailySnapshots_id": [str(today - i) for i in range(rows)],
+        "financialsDailySnapshots_mintedTokenSupplies": [rng.randrange(10 ** 27, 10 ** 28) for _ in range(rows)],
+    })
+    for column in [
+        "totalValueLockedUSD", "dailyProtocolSideRevenueUSD", "dailySupplySideRevenueUSD", "dailyTotalRevenueUSD",
+        "totalDepositBalanceUSD", "totalBorrowBalanceUSD", "dailyDepositUSD", "dailyBorrowUSD", "dailyLiquidateUSD",
+        "cumulativeBorrowUSD", "cumulativeLiquidateUSD",
+    ]:
+        frame[f"financialsDailySnapshots_{column}"] = np.array([rng.uniform(0, 1e9) for _ in range(rows)])
+    return frame
+
+
+def whale_watcher_swaps(rows, rng, networks):
+    now = int(time.time())
+    return pd.DataFrame({
+        "swaps_hash": [f"0x{rng.getrandbits(256):064x}" for _ in range(rows)],
+        "swaps_protocol_name": "Uniswap V3",
+        "swaps_protocol_network": [rng.choice(networks).upper() for _ in range(rows)],
+        "swaps_timestamp": pd.to_datetime(np.arange(now, now - rows, -1), unit="s"),
+        "swaps_tokenIn_symbol": [f"TKN{rng.randrange(50)}" for _ in range(rows)],
+        "swaps_amountInUSD": [rng.uniform(1e5, 1e7) for _ in range(rows)],
+        "swaps_tokenOut_symbol": [f"TKN{rng.randrange(50)}" for _ in range(rows)],
+        "swaps_amountOutUSD": [rng.uniform(1e5, 1e7) for _ in range(rows)],
+    })
+
+
+def uniswap_snapshots(rows, rng):
+    today = int(time.time()) // 86400
+    ids = [str(today - i) for i in range(rows)]
+    financial = pd.DataFrame({
+        "id": ids,
+        "totalValueLockedUSD": [rng.uniform(1e8, 1e9) for _ in range(rows)],
+        "cumulativeVolumeUSD": [rng.uniform(1e9, 1e11) for _ in range(rows)],
+        "cumulativeTotalRevenueUSD": [rng.uniform(1e7, 1e9) for _ in range(rows)],
+    })
+    usage = pd.DataFrame({"id": ids, "dailyActiveUsers": [rng.randrange(10 ** 5) for _ in range(rows)]})
+    return financial, usage
+
+
+def erc20_token_snapshots(rows, rng):
+    today = int(time.time()) // 86400
+    return pd.DataFrame({
+        "tokenDailySnapshots_id": [f"0x{i % 50:040x}-{today - i // 50}" for i in range(rows)],
+        "tokenDailySnapshots_dailyTransferCount": [rng.randrange(10 ** 5) for _ in range(rows)],
+        "tokenDailySnapshots_dailyTransferAmount": [rng.uniform(0, 1e12) for _ in range(rows)],
+    })
+
+
+def transforms():
+    """
+    {name: (setup(rows, rng) -> state, run(state))}. `setup` builds the
+    input once per size, `run` gets a fresh copy of it for every repeat.
+    """
+    curve = load("curve-pool-depeg/app.py", ["add_depeg", "calc_depeg", "calc_input_token_price"])
+    makerdao = load("makerdao-analytics/makerdao.py", ["get_asset_tvl", "format_financial_snapshots"])
+    whale = load("whale-watcher/app.py", ["format_swaps"], constants=["EXPLORERS"])
+    uniswap = load("uniswap-analytics/app.py", ["format_snapshots"])
+    erc20 = load("erc20-analytics/app.py", ["format_token_snapshots"])
+    dex = load(
+        "dex-dashboard/utils.py",
+        ["series_fingerprint", "format_xaxis", "format_timestamps"],
+        constants=["XAXIS_LABELS_CACHE_SIZE", "_xaxis_labels", "_xaxis_labels_lock", "DATE_DIRECTIVES"],
+    )
+
+    def format_xaxis(series):
+        # Time the conversion, not a hit of the label cache
+        dex["_xaxis_labels"].clear()
+        return dex["format_xaxis"](series)
+
+    return {
+        "curve-pool-depeg:add_depeg": (curve_pool_snapshots, lambda state: curve["add_depeg"](state[0].copy(), state[1])),
+        "makerdao-analytics:get_asset_tvl": (makerdao_markets, lambda frame: makerdao["get_asset_tvl"](frame)),
+        "makerdao-analytics:format_financial_snapshots": (
+            makerdao_financial_snapshots,
+            lambda frame: makerdao["format_financial_snapshots"](frame.copy()),
+        ),
+        "whale-watcher:format_swaps": (
+            lambda rows, rng: whale_watcher_swaps(rows, rng, list(whale["EXPLORERS"])),
+            lambda frame: whale["format_swaps"](frame.copy()),
+        ),
+        "uniswap-analytics:format_snapshots": (
+            uniswap_snapshots,
+            lambda state: uniswap["format_snapshots"](state[0], state[1], "matic"),
+        ),
+        "erc20-analytics:format_token_snapshots": (
+            erc20_token_snapshots,
+            lambda frame: erc20["format_token_snapshots"](frame),
+        ),
+        "dex-dashboard:format_xaxis": (
+            lambda rows, rng: list(range(int(time.time()) // 86400 - rows, int(time.time()) // 86400)),
+            format_xaxis,
+        ),
+    }
+
+
+def measure(setup, run, sizes, repeat, max_seconds, seed=0):
+    """
+    [{rows, seconds, us_per_row, exponent}] for each size, seconds being None
+    once a previous size exceeded `max_seconds`.
+    """
+    results = []
+    previous = None
+    for rows in sizes:
+        if previous is not None and previous["seconds"] is not None and previous["seconds"] > max_seconds:
+            results.append({"rows": rows, "seconds": None, "us_per_row": None, "exponent": None})
+            previous = results[-1]
+            continue
+
+        state = setup(rows, random.Random(seed))
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - start)
+            # A single run is enough to tell a slow size apart
+            if timings[-1] > max_seconds:
+                break
+
+        seconds = min(timings)
+        exponent = None
+        if previous is not None and previous["seconds"]:
+            exponent = math.log(seconds / previous["seconds"]) / math.log(rows / previous["rows"])
+        results.append({"rows": rows, "seconds": seconds, "us_per_row": seconds / rows * 1e6, "exponent": exponent})
+        previous = results[-1]
+    return results
+
+
+def report(name, results):
+    print(name)
+    print(f"{'rows':>12}{'seconds':>12}{'us/row':>12}{'exponent':>10}")
+    for result in results:
+        if result["seconds"] is None:
+            print(f"{result['rows']:>12}{'skipped':>12}")
+            continue
+        exponent = f"{result['exponent']:.2f}" if result["exponent"] is not None else "-"
+        print(f"{result['rows']:>12}{result['seconds']:>12.4f}{result['us_per_row']:>12.2f}{exponent:>10}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS, help="Skip larger sizes after a run this long")
+    parser.add_argument("--only", nargs="*", help="Transforms to run, e.g. whale-watcher:format_swaps")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    selected = {
+        name: transform
+        for name, transform in transforms().items()
+        if not args.only or name in args.only
+    }
+    results = {}
+    for name, (setup, run) in selected.items():
+        results[name] = measure(setup, run, sorted(args.sizes), args.repeat, args.max_seconds)
+        report(name, results[name])
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
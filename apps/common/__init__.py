@@ -0,0 +1,3 @@
+"""
+Modules shared by the apps, importable once the apps directory is on the path.
+"""
@@ -0,0 +1,74 @@
+import threading
+from contextlib import ExitStack
+
+from common.tracing import count
+
+
+class Coalescer:
+    """
+    Coalesces concurrent loads of the same keys: the first caller missing a
+    key loads it while the others wait for its result, so N sessions missing
+    the same key together cost one load.
+
+    Holders of process-wide results (query cache, dataset store, API client)
+    keep one each and say how to look a key up and how to load it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, key, lookup, load):
+        """
+        Value of `key`, from `lookup` or else from `load()`.
+        """
+        return self.get_many([key], lookup, lambda missing: {key: load()})[key]
+
+    def get_many(self, keys, lookup, load):
+        """
+        {key: value} of `keys`. `lookup(key)` is (True, value) for a key that
+        can be served and (False, None) otherwise. The keys still missing once
+        their locks are held are passed together to `load(missing)`, which
+        stores them and returns {key: value} for them.
+        """
+        values, missing = self._lookup(keys, lookup)
+        if not missing:
+            return values
+
+        # Locks are taken in one order, so overlapping batches cannot deadlock
+        with self._lock:
+            key_locks = [self._key_locks.setdefault(key, threading.Lock()) for key in sorted(missing, key=repr)]
+
+        with ExitStack() as stack:
+            for key_lock in key_locks:
+                stack.enter_context(key_lock)
+
+            # Other sessions may have loaded some while we were waiting
+            found, missing = self._lookup(missing, lookup)
+            values.update(found)
+            if not missing:
+                return values
+
+            count(cache_misses=len(missing))
+            try:
+                values.update(load(missing))
+            finally:
+                with self._lock:
+                    for key in missing:
+                        self._key_locks.pop(key, None)
+
+        return values
+
+    @staticmethod
+    def _lookup(keys, lookup):
+        found, missing = {}, []
+        for key in keys:
+            hit, value = lookup(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if found:
+            count(cache_hits=len(found))
+        return found, missing
@@ -0,0 +1,63 @@
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+# How each GraphQL scalar of the subgraph schemas is stored in a dataframe.
+# "Timestamp" stands for BigInt fields holding Unix seconds. Types not listed
+# here (enums, unknown scalars) are decoded as strings.
+SCALAR_DTYPES = {
+    "BigInt": "int64",
+    "Int": "int64",
+    "BigDecimal": "float64",
+    "Timestamp": "datetime64",
+    "Boolean": "boolean",
+    "Bytes": "string",
+    "ID": "string",
+    "String": "string",
+}
+
+
+def decode_integer(series):
+    """
+    BigInt overflow strategy: a column decodes to int64 when every value fits
+    in 64 bits (nullable Int64 if some are missing) and to float64 otherwise.
+    256-bit values, such as token amounts in native units, thus keep their
+    magnitude and 15-16 significant digits, enough to display and sort them.
+    Callers needing exact values must keep the raw column of Python ints.
+    """
+    present = series.dropna()
+    numeric = pd.to_numeric(present, errors="coerce")
+    if is_integer_dtype(numeric.dtype) and numeric.dtype != "uint64":
+        if len(present) == len(series):
+            return numeric.astype("int64")
+        return numeric.astype("Int64").reindex(series.index)
+
+    return pd.to_numeric(series, errors="coerce").astype("float64")
+
+
+def decode_column(series, scalar):
+    """
+    Converts a whole column of raw subgraph values (strings, or Python
+    numbers once Subgrounds' transforms ran) to the dtype of `scalar`.
+    """
+    dtype = SCALAR_DTYPES.get(scalar, "string")
+    if dtype == "int64":
+        return decode_integer(series)
+    if dtype == "float64":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if dtype == "datetime64":
+        return pd.to_datetime(decode_integer(series), unit="s")
+
+    return series.astype(dtype)
+
+
+def decode(dataframe, scalars):
+    """
+    Decodes the columns of `dataframe` listed in `scalars` ({column: GraphQL
+    scalar name}) in place and returns it. Missing columns and None scalars
+    are skipped.
+    """
+    for column, scalar in scalars.items():
+        if scalar is not None and column in dataframe.columns:
+            dataframe[column] = decode_column(dataframe[column], scalar)
+
+    return dataframe
@@ -0,0 +1,150 @@
+import numpy as np
+
+
+def lttb_indices(y, max_points, x=None):
+    """
+    Positions of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves the visual shape (peaks
+    included) of the series. `x` defaults to evenly spaced positions, as for
+    daily snapshots drawn on a category axis.
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(y)
+    if max_points is None or max_points < 3 or n <= max_points:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # max_points - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[bucket + 1] = a
+
+    return indices
+
+
+def minmax_indices(y, max_points):
+    """
+    Positions of the minimum and maximum of `(max_points - 2) // 2` equal
+    buckets, plus the first and last points. Cheaper than LTTB and keeps every local
+    extreme, which suits bar charts.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points is None or max_points < 4 or n <= max_points:
+        return np.arange(n)
+
+    filled = np.nan_to_num(y)
+    edges = np.linspace(0, n, (max_points - 2) // 2 + 1).astype(int)
+    extremes = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        extremes.append(start + int(np.argmin(filled[start:end])))
+        extremes.append(start + int(np.argmax(filled[start:end])))
+
+    return np.unique(extremes)
+
+
+def zoom_window(categories, start, end):
+    """
+    (first, last) categories of the window from `start` to `end` percent of
+    `categories`, as a chart data zoom reports it. None when zoomed out.
+    """
+    if not categories or (start <= 0 and end >= 100):
+        return None
+
+    last = len(categories) - 1
+    return categories[int(np.floor(start / 100 * last))], categories[int(np.ceil(end / 100 * last))]
+
+
+def window_range(xaxis_data, window):
+    """
+    (start, stop) positions of the `window` categories in `xaxis_data`, None
+    without a window or when its categories are no longer on the axis.
+    """
+    if window is None or window[0] not in xaxis_data or window[1] not in xaxis_data:
+        return None
+
+    return xaxis_data.index(window[0]), xaxis_data.index(window[1]) + 1
+
+
+def visible_indices(indices_of, y, max_points, window=None):
+    """
+    `indices_of(y, max_points)` over the whole series plus the same over the
+    `window` (start, stop) slice, so the zoomed-in range keeps up to
+    `max_points` points of its own: every point unless it is wider.
+    """
+    indices = indices_of(y, max_points)
+    if window is None:
+        return indices
+
+    start, stop = window
+    return np.union1d(indices, start + indices_of(y[start:stop], max_points))
+
+
+def keep_points(chart, yaxis_data, indices, axis_chart=None):
+    """
+    Restrict the series last added to `chart` to the points at `indices`.
+
+    The x-axis of `axis_chart` (`chart` itself, unless the series is
+    overlapped on another chart) only lists the categories kept by any of its
+    series. Downsampled series are sent as `[category, value]` pairs so they
+    stay on their own category, and once the axis is trimmed so are the
+    series that kept every point.
+    """
+    axis_chart = chart if axis_chart is None else axis_chart
+    xaxis_data = chart._xaxis_data
+    if not hasattr(axis_chart, "_axis_series"):
+        axis_chart._axis_series = []
+        axis_chart._kept_indices = np.arange(0)
+
+    axis_chart._axis_series.append((chart.options["series"][-1], xaxis_data, yaxis_data, indices))
+    kept = np.union1d(axis_chart._kept_indices, indices)
+    axis_chart._kept_indices = kept
+
+    trimmed = len(kept) < len(xaxis_data)
+    for series, series_xaxis, series_yaxis, series_indices in axis_chart._axis_series:
+        if trimmed or len(series_indices) < len(series_yaxis):
+            series["data"] = [[series_xaxis[i], series_yaxis[i]] for i in series_indices]
+    axis_chart.options["xAxis"][0]["data"] = [xaxis_data[i] for i in kept]
+
+
+def downsample_frame(dataframe, x_column, y_column, max_points, by=None):
+    """
+    Rows of `dataframe` kept by LTTB on `y_column` once ordered by `x_column`,
+    independently for each group of `by` if given (one line per group).
+    """
+    dataframe = dataframe.sort_values(x_column, kind="stable")
+    values = dataframe[y_column].to_numpy()
+    if by is None:
+        return dataframe.iloc[lttb_indices(values, max_points)]
+
+    groups = dataframe.groupby(by, sort=False).indices.values()
+    kept = [rows[lttb_indices(values[rows], max_points)] for rows in groups]
+    return dataframe.iloc[np.sort(np.concatenate(kept))] if kept else dataframe
+
+
+def downsample_stacked(dataframe, x_column, y_column, max_points, by):
+    """
+    Rows of a stacked chart (one layer per group of `by`) kept by LTTB on the
+    stack total, so every layer keeps the same x values and stacks stay whole.
+    """
+    totals = dataframe.groupby(x_column)[y_column].sum().sort_index()
+    kept = totals.index[lttb_indices(totals.to_numpy(), max_points)]
+    return dataframe[dataframe[x_column].isin(kept)][[x_column, y_column, by]]
@@ -0,0 +1,73 @@
+import threading
+
+import pandas as pd
+
+SECONDS_PER_DAY = 60 * 60 * 24
+
+
+class IncrementalSnapshots:
+    """
+    Keeps the last synced daily snapshots per (deployment, entity) so a refresh
+    only downloads what can still change.
+
+    Daily snapshot ids are day numbers and a day's row is immutable once the
+    day has closed, so after the first full load only rows from the last
+    synced (possibly still open) day onwards are fetched. That day is upserted
+    and any newer days are appended to the cached frame.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, key, fetch, id_column, initial_timestamp=0, ascending=True, window=None):
+        """
+        `fetch(timestamp)` must return the snapshots whose timestamp is strictly
+        greater than `timestamp`, with the same columns on every call.
+        """
+        new_rows = fetch(self.since(key, id_column, initial_timestamp))
+
+        return self.merge(key, new_rows, id_column, ascending=ascending, window=window)
+
+    def since(self, key, id_column, initial_timestamp=0):
+        """
+        Timestamp after which rows must be fetched to bring `key` up to date.
+        """
+        with self._lock:
+            frame = self.frames.get(key)
+
+        if frame is None or frame.empty:
+            return initial_timestamp
+
+        open_day = int(frame[id_column].astype(int).max())
+        return open_day * SECONDS_PER_DAY - 1
+
+    def merge(self, key, new_rows, id_column, ascending=True, window=None):
+        with self._lock:
+            frame = self.frames.get(key)
+
+        if frame is None or frame.empty:
+            dataframe = new_rows
+        elif new_rows.empty:
+            dataframe = frame
+        else:
+            days = frame[id_column].astype(int)
+            open_day = int(days.max())
+
+            dataframe = pd.concat([frame[days < open_day], new_rows], ignore_index=True)
+            dataframe = dataframe.drop_duplicates(subset=id_column, keep="last")
+
+        if not dataframe.empty:
+            order = dataframe[id_column].astype(int).sort_values(ascending=ascending).index
+            dataframe = dataframe.loc[order]
+            if window is not None:
+                dataframe = dataframe.head(window)
+            dataframe = dataframe.reset_index(drop=True)
+
+        with self._lock:
+            self.frames[key] = dataframe
+
+        return dataframe
+
+
+SNAPSHOTS = IncrementalSnapshots()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import subgrounds.client as client
+from subgrounds.schema import mk_schema
+from subgrounds.subgraph import Subgraph
+from subgrounds.transform import DEFAULT_SUBGRAPH_TRANSFORMS
+
+# Shared by every app on the machine, several of them load the same subgraphs
+CACHE_DIR = os.environ.get(
+    "SUBGRAPH_SCHEMA_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "subgraph-schemas"),
+)
+
+# Minimum delay between two checks of the deployment behind an endpoint
+REVALIDATE_INTERVAL_SEC = 600
+
+DEPLOYMENT_QUERY = "{ _meta { deployment } }"
+
+# `schema` is the parsed schema, `checked_at` the last time `deployment` was
+# confirmed against the endpoint (0 when only read from disk)
+SchemaEntry = namedtuple("SchemaEntry", ["deployment", "schema", "checked_at"])
+
+
+class SchemaCache:
+    """
+    Subgraph schemas kept on disk per endpoint, with the deployment hash they
+    were introspected from.
+
+    Loading a subgraph never waits on introspection once its schema has been
+    stored: it is read from memory, or from disk on a cold start. The endpoint
+    is then revalidated on a background thread, at most once per interval, by
+    asking only for its current deployment hash. A full introspection runs
+    again only when that hash changed, and the new schema is used from the
+    next load (the next Streamlit rerun) on. Endpoints that do not expose
+    their deployment are introspected again at every interval instead.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, revalidate_interval_sec=REVALIDATE_INTERVAL_SEC):
+        self.cache_dir = cache_dir
+        self.revalidate_interval_sec = revalidate_interval_sec
+        self.entries = {}
+        self.subgraphs = {}
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+    def load_subgraph(self, subground, url):
+        """
+        Drop-in replacement for `subground.load_subgraph(url)`.
+
+        Building a Subgraph walks the whole schema, so it is shared by every
+        load until the schema changes. That is safe since Subgrounds creates a
+        new field path on each attribute access of its objects.
+        """
+        schema = self.schema(url)
+        with self._lock:
+            built = self.subgraphs.get(url)
+
+        if built is None or built[0] is not schema:
+            built = (schema, Subgraph(url, schema, DEFAULT_SUBGRAPH_TRANSFORMS))
+            with self._lock:
+                self.subgraphs[url] = built
+
+        subground.subgraphs[url] = built[1]
+        return built[1]
+
+    def schema(self, url):
+        with self._lock:
+            entry = self.entries.get(url)
+
+        if entry is None:
+            entry = self.read(url) or self.introspect(url)
+            with self._lock:
+                self.entries[url] = entry
+
+        if time.time() - entry.checked_at >= self.revalidate_interval_sec:
+            self.revalidate_in_background(url)
+
+        return entry.schema
+
+    def revalidate_in_background(self, url):
+        with self._lock:
+            if url in self._revalidating:
+                return
+            self._revalidating.add(url)
+
+        threading.Thread(target=self.revalidate, args=(url,), daemon=True).start()
+
+    def revalidate(self, url):
+        try:
+            with self._lock:
+                entry = self.entries[url]
+
+            deployment = self.deployment(url)
+            if deployment is not None and deployment == entry.deployment:
+                entry = entry._replace(checked_at=time.time())
+            else:
+                entry = self.introspect(url, deployment)
+
+            with self._lock:
+                self.entries[url] = entry
+        except Exception:
+            # Keep serving the stored schema, the next interval retries
+            with self._lock:
+                self.entries[url] = self.entries[url]._replace(checked_at=time.time())
+        finally:
+            with self._lock:
+                self._revalidating.discard(url)
+
+    @staticmethod
+    def deployment(url):
+        """
+        Deployment hash currently served at `url`, None if the endpoint does
+        not expose it.
+        """
+        try:
+            return client.query(url, DEPLOYMENT_QUERY)["_meta"]["deployment"]
+        except Exception:
+            return None
+
+    def introspect(self, url, deployment=None):
+        deployment = deployment or self.deployment(url)
+        introspection = client.get_schema(url)
+        self.write(url, deployment, introspection)
+
+        return SchemaEntry(deployment, mk_schema(introspection), time.time())
+
+    def path(self, url):
+        digest = hashlib.sha1(url.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def read(self, url):
+        try:
+            with open(self.path(url)) as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if stored.get("url") != url:
+            return None
+
+        return SchemaEntry(stored["deployment"], mk_schema(stored["schema"]), 0)
+
+    def write(self, url, deployment, introspection):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path(url)
+            # Written aside then renamed, so other apps never read half a file
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(partial, "w") as cache_file:
+                json.dump({"url": url, "deployment": deployment, "schema": introspection}, cache_file)
+            os.replace(partial, path)
+        except OSError:
+            # A read-only disk only costs the introspection on the next start
+            pass
+
+
+SCHEMAS = SchemaCache()
@@ -0,0 +1,137 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from graphql import parse
+from graphql.language import ListTypeNode, NonNullTypeNode, ObjectTypeDefinitionNode
+
+# Schemas the apps' subgraphs are built on, kept at the repository root
+SCHEMAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+DEX_AMM_SCHEMA_PATH = os.path.join(SCHEMAS_DIR, "schema-dex-amm.graphql")
+LENDING_SCHEMA_PATH = os.path.join(SCHEMAS_DIR, "schema-lending.graphql")
+
+# `type` is the named GraphQL type once list and non-null wrappers are removed
+SchemaField = namedtuple("SchemaField", ["type", "is_list", "is_entity"])
+
+
+@lru_cache(maxsize=None)
+def entity_fields(path):
+    """
+    Fields of every entity declared in a subgraph schema file, as
+    {entity: {field: SchemaField}}.
+    """
+    with open(path) as schema_file:
+        document = parse(schema_file.read())
+
+    definitions = [
+        definition for definition in document.definitions
+        if isinstance(definition, ObjectTypeDefinitionNode)
+    ]
+    entities = {definition.name.value for definition in definitions}
+
+    def unwrap(type_node, is_list=False):
+        if isinstance(type_node, NonNullTypeNode):
+            return unwrap(type_node.type, is_list)
+        if isinstance(type_node, ListTypeNode):
+            return unwrap(type_node.type, True)
+        return type_node.name.value, is_list
+
+    fields = {}
+    for definition in definitions:
+        fields[definition.name.value] = {}
+        for field in definition.fields:
+            type_name, is_list = unwrap(field.type)
+            fields[definition.name.value][field.name.value] = SchemaField(
+                type_name, is_list, type_name in entities
+            )
+
+    return fields
+
+
+def leaf_scalar(entity, path, schema_path):
+    """
+    Scalar type name of the field reached by following `path` (field names)
+    from `entity`, or None if the schema has no such field. BigInt fields named
+    like timestamps are reported as "Timestamp" for the decoder.
+    """
+    fields = entity_fields(schema_path)
+    for name in path[:-1]:
+        field = fields.get(entity, {}).get(name)
+        if field is None or not field.is_entity or field.is_list:
+            return None
+        entity = field.type
+
+    field = fields.get(entity, {}).get(path[-1])
+    if field is None or field.is_list:
+        return None
+    if field.is_entity:
+        return leaf_scalar(field.type, ("id",), schema_path)
+    if field.type == "BigInt" and (path[-1] == "timestamp" or path[-1].endswith("Timestamp")):
+        return "Timestamp"
+
+    return field.type
+
+
+def scalars_of(entity, fieldpaths, schema_path):
+    """
+    {dataframe column: scalar type name} of Subgrounds field paths selected
+    from a query on `entity`, for the decoder. Fields missing from the schema
+    file (older deployments) map to None and are left as they are.
+    """
+    return {
+        fpath._name(): leaf_scalar(entity, tuple(fpath._name_path()[1:]), schema_path)
+        for fpath in fieldpaths
+    }
+
+
+class Projection:
+    """
+    Selects only the fields behind a table's columns instead of a whole entity.
+
+    `columns` are the table columns in display order, `aliases` maps the ones
+    not named after their schema field to that field. Fields referencing
+    another entity select its id. Columns are checked against the schema when
+    the projection is built, so a schema change fails loudly instead of
+    shifting the columns of the table.
+    """
+
+    def __init__(self, entity, columns, path, aliases=None):
+        aliases = aliases or {}
+        schema = entity_fields(path)[entity]
+
+        self.columns = list(columns)
+        self.paths = {}
+        self.scalars = {}
+        for column in self.columns:
+            field = aliases.get(column, column)
+            if field not in schema:
+                raise ValueError(f"{entity} has no field {field!r} for column {column!r}")
+            if schema[field].is_list:
+                raise ValueError(f"{entity}.{field} is a list and cannot be a table column")
+
+            self.paths[column] = (field, "id") if schema[field].is_entity else (field,)
+            self.scalars[column] = leaf_scalar(entity, self.paths[column], path)
+
+    def select(self, fieldpath):
+        """
+        Field paths of every column under `fieldpath`, e.g. `Query.swaps(...)`.
+        """
+        selected = []
+        for path in self.paths.values():
+            leaf = fieldpath
+            for name in path:
+                leaf = getattr(leaf, name)
+            selected.append(leaf)
+
+        return selected
+
+    def rename(self, dataframe, prefix):
+        """
+        Renames the columns Subgrounds generates for `prefix` (the name of the
+        queried field, e.g. "swaps") to the table columns, in display order.
+        """
+        renames = {
+            "_".join((prefix, *path)): column for column, path in self.paths.items()
+        }
+
+        return dataframe.rename(columns=renames).reindex(columns=self.columns)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from pyecharts.charts import Bar, Line
+
+from common.downsample import keep_points, lttb_indices, minmax_indices, visible_indices, zoom_window, window_range
+
+
+def drawn_points(chart, series):
+    """
+    (category, value) of every point of `series` as ECharts places it on the
+    x-axis of `chart`.
+    """
+    categories = chart.options["xAxis"][0]["data"]
+    points = []
+    for position, item in enumerate(series["data"]):
+        if isinstance(item, list):
+            points.append(tuple(item))
+        else:
+            points.append((categories[position], item))
+    return points
+
+
+def assert_aligned(chart, series_values, xaxis_data):
+    categories = set(chart.options["xAxis"][0]["data"])
+    for series, values in zip(chart.options["series"], series_values):
+        for category, value in drawn_points(chart, series):
+            assert category in categories
+            assert value == values[xaxis_data.index(category)]
+
+
+@pytest.mark.parametrize("full_first", [True, False])
+def test_series_keeping_every_point_follow_a_trimmed_axis(full_first):
+    xaxis_data = [f"day {i}" for i in range(10)]
+    full = list(range(10))
+    sampled = [i * 10 for i in range(10)]
+    chart = Bar().add_xaxis(xaxis_data)
+
+    series = [(full, np.arange(10)), (sampled, np.array([0, 3, 9]))]
+    if not full_first:
+        series.reverse()
+    for values, indices in series:
+        chart.add_yaxis("series", values)
+        keep_points(chart, values, indices)
+
+    assert chart.options["xAxis"][0]["data"] == xaxis_data
+    assert_aligned(chart, [values for values, _ in series], xaxis_data)
+
+
+@pytest.mark.parametrize("n", [1001, 1020])
+@pytest.mark.parametrize("zoom", [(0, 99), (1, 99.5), (40, 60)])
+@pytest.mark.parametrize("seed", range(4))
+def test_zoomed_bar_and_line_share_the_drawn_axis(n, zoom, seed):
+    rng = np.random.default_rng(seed)
+    xaxis_data = [f"day {i}" for i in range(n)]
+    bars = [rng.random(n).tolist(), (rng.random(n) ** 4).tolist()]
+    line = rng.random(n).cumsum().tolist()
+    window = window_range(xaxis_data, zoom_window(xaxis_data, *zoom))
+
+    bar_chart = Bar().add_xaxis(xaxis_data)
+    line_chart = Line().add_xaxis(xaxis_data)
+    for values in bars:
+        bar_chart.add_yaxis("bars", values)
+        keep_points(bar_chart, values, visible_indices(minmax_indices, values, 1000, window))
+    line_chart.add_yaxis("line", line)
+    keep_points(line_chart, line, visible_indices(lttb_indices, line, 1000, window), axis_chart=bar_chart)
+
+    assert_aligned(bar_chart, bars, xaxis_data)
+    categories = set(bar_chart.options["xAxis"][0]["data"])
+    assert all(category in categories for category, _ in line_chart.options["series"][0]["data"])
@@ -0,0 +1,202 @@
+import contextvars
+import functools
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+import streamlit as st
+import subgrounds.client as client
+
+# JSON-lines file every finished run appends its sections to, for offline
+# aggregation. Unset disables the log.
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH")
+
+# tracemalloc slows allocations down noticeably, only trace memory on demand
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY", "") not in ("", "0")
+
+# Counters summed into enclosing sections when a section ends. payload_bytes
+# is what a section hands to the browser, e.g. serialized chart options.
+COUNTERS = ("queries", "response_bytes", "payload_bytes", "cache_hits", "cache_misses")
+
+PANEL_COLUMNS = ["section", "wall_ms", "queries", "response_bytes", "payload_bytes", "rows", "peak_kb", "cache_hits", "cache_misses"]
+
+_trace = contextvars.ContextVar("trace", default=None)
+_section = contextvars.ContextVar("section", default=None)
+
+
+class Trace:
+    """
+    Sections recorded during one run of an app script.
+
+    A section records its wall time, the subgraph queries sent while it was
+    open (count and response bytes), the rows it produced, its tracemalloc
+    peak when TRACE_MEMORY is set, and the cache hits and misses reported by
+    the caches it went through. The trace follows the script through context
+    variables, so sections opened from worker threads are recorded as long
+    as the thread runs in a copy of the script's context. Memory peaks of
+    sections overlapping on several threads are approximate.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.sections = []
+
+    @contextmanager
+    def section(self, name):
+        parent = _section.get()
+        record = {
+            "app": self.app,
+            "run_id": self.run_id,
+            "section": name,
+            "parent": parent["section"] if parent else None,
+            "rows": None,
+            "peak_kb": None,
+            **{counter: 0 for counter in COUNTERS},
+        }
+        token = _section.set(record)
+
+        memory_start = None
+        if tracemalloc.is_tracing():
+            memory_start, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent["_peak"] = max(parent.get("_peak", 0), peak)
+            record["_peak"] = memory_start
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as exn:
+            record["error"] = repr(exn)
+            raise
+        finally:
+            record["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+            if memory_start is not None and tracemalloc.is_tracing():
+                record["_peak"] = max(record["_peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_kb"] = round((record["_peak"] - memory_start) / 1024, 1)
+                tracemalloc.reset_peak()
+            peak = record.pop("_peak", None)
+
+            _section.reset(token)
+            if parent is not None:
+                for counter in COUNTERS:
+                    parent[counter] += record[counter]
+                if peak is not None:
+                    parent["_peak"] = max(parent.get("_peak", 0), peak)
+
+            self.sections.append(record)
+
+    def finish(self):
+        """
+        Appends the sections of the run to the JSON-lines log, if enabled.
+        """
+        if TRACE_LOG_PATH is None:
+            return
+
+        with open(TRACE_LOG_PATH, "a") as log:
+            for record in self.sections:
+                log.write(json.dumps({"started_at": self.started_at, **record}, default=str) + "\n")
+
+
+class _CountingRequests:
+    """
+    Stands in for the `requests` module inside `subgrounds.client`, counting
+    every response into the section open when the query was sent.
+    """
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def post(self, *args, **kwargs):
+        response = requests.post(*args, **kwargs)
+        count(queries=1, response_bytes=len(response.content))
+        return response
+
+
+def start_trace(app):
+    """
+    Starts the trace of the current script run, call once at the top of the
+    script.
+    """
+    if not isinstance(client.requests, _CountingRequests):
+        client.requests = _CountingRequests()
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    trace = Trace(app)
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def section(name):
+    """
+    Records the enclosed block as a section of the current trace, or does
+    nothing outside of a traced run.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield {}
+        return
+
+    with trace.section(name) as record:
+        yield record
+
+
+def traced(name=None):
+    """
+    Decorator recording each call as a section, with the length of the result
+    as row count when it is a dataframe.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section(name or fn.__name__) as record:
+                result = fn(*args, **kwargs)
+                if hasattr(result, "columns"):
+                    record["rows"] = len(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def count(**increments):
+    """
+    Adds to the counters of the section currently open, e.g. cache_hits=1.
+    """
+    record = _section.get()
+    if record is not None:
+        for counter, value in increments.items():
+            record[counter] += value
+
+
+def render_trace_panel(trace):
+    """
+    Optional sidebar table of the sections of the current run.
+    """
+    if st.sidebar.checkbox("Show performance trace", value=False):
+        st.sidebar.dataframe(pd.DataFrame(trace.sections, columns=PANEL_COLUMNS))
+
+
+def summarize_log(path=TRACE_LOG_PATH):
+    """
+    Per (app, section) distribution of the wall time and mean counters of the
+    runs in a JSON-lines trace log.
+    """
+    log = pd.read_json(path, lines=True)
+    grouped = log.groupby(["app", "section"])
+
+    return grouped["wall_ms"].describe(percentiles=[0.5, 0.95]).join(
+        grouped[["queries", "response_bytes", "payload_bytes", "rows", "peak_kb"]].mean()
+    )
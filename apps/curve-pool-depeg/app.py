@@ -1,9 +1,19 @@
+import os
+import sys
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
 import streamlit as st
 import altair as alt
 import pandas as pd
-from subgrounds import Subgrounds
+from subgrounds.subgrounds import Subgrounds
 from itertools import cycle
 from datetime import datetime, timedelta
+from common.introspection import SCHEMAS
+from common.tracing import render_trace_panel, section, start_trace, traced
 
 sg = Subgrounds()
 subgraphs_urls = {
@@ -14,11 +24,13 @@ subgraphs_urls = {
 }
 network_list = ['ethereum', 'gnosis', 'optimism', 'fantom']
 
+@traced()
 def load_subgraph(url):
-    subgraph = sg.load_subgraph(url)
+    subgraph = SCHEMAS.load_subgraph(sg, url)
     subgraph._transforms = []
     return subgraph
 
+@traced()
 def get_data(subgraph, network, startTime, numberPools):
     #Define Query Fieldpath
     liquidity_pools = subgraph.Query.liquidityPools(
@@ -34,34 +46,35 @@ def get_data(subgraph, network, startTime, numberPools):
     )
 
     #Query
-    df = sg.query_df([
-        liquidity_pools.symbol,
-        liquidity_pools.inputTokens.name,
-        liquidity_pools.totalValueLockedUSD,
-        lp_snapshots.timestamp,
-        lp_snapshots.totalValueLockedUSD,
-        lp_snapshots.inputTokenWeights,
-        lp_snapshots.inputTokenBalances,
-    ])
-
-    dec = sg.query_df([
-        liquidity_pools.inputTokens.name,
-        liquidity_pools.inputTokens.decimals
-    ])
+    with section("get_data:query"):
+        df = sg.query_df([
+            liquidity_pools.symbol,
+            liquidity_pools.inputTokens.name,
+            liquidity_pools.totalValueLockedUSD,
+            lp_snapshots.timestamp,
+            lp_snapshots.totalValueLockedUSD,
+            lp_snapshots.inputTokenWeights,
+            lp_snapshots.inputTokenBalances,
+        ])
+
+        dec = sg.query_df([
+            liquidity_pools.inputTokens.name,
+            liquidity_pools.inputTokens.decimals
+        ])
 
     dec_dict = (pd.Series(dec.liquidityPools_inputTokens_decimals.values, index=dec.liquidityPools_inputTokens_name).to_dict())
     
     snapshot_cols = df[0].columns.tolist()
     snapshot_cols.remove("liquidityPools_inputTokens_name")
-    df_0 = df[0].groupby(snapshot_cols, axis=0)['liquidityPools_inputTokens_name'].apply(list).reset_index()
+    df_0 = df[0].groupby(snapshot_cols)['liquidityPools_inputTokens_name'].apply(list).reset_index()
 
     snapshot_cols = df[1].columns.tolist()
     snapshot_cols.remove("liquidityPools_dailySnapshots_inputTokenWeights")
-    df_1 = df[1].groupby(snapshot_cols, axis=0)['liquidityPools_dailySnapshots_inputTokenWeights'].apply(list).reset_index()
+    df_1 = df[1].groupby(snapshot_cols)['liquidityPools_dailySnapshots_inputTokenWeights'].apply(list).reset_index()
 
     snapshot_cols = df[2].columns.tolist()
     snapshot_cols.remove("liquidityPools_dailySnapshots_inputTokenBalances")
-    df_2 = df[2].groupby(snapshot_cols, axis=0)['liquidityPools_dailySnapshots_inputTokenBalances'].apply(list).reset_index()
+    df_2 = df[2].groupby(snapshot_cols)['liquidityPools_dailySnapshots_inputTokenBalances'].apply(list).reset_index()
 
     df = pd.merge(df_0, pd.merge(df_1, df_2))
     df = df.rename(columns={'liquidityPools_inputTokens_name': 'input_tokens_name', 
@@ -69,13 +82,17 @@ def get_data(subgraph, network, startTime, numberPools):
                             'liquidityPools_dailySnapshots_inputTokenBalances': 'daily_input_tokens_balance', 
                             'liquidityPools_dailySnapshots_totalValueLockedUSD': 'daily_tvl', 
                             'liquidityPools_totalValueLockedUSD': 'TVL'})
-    df['daily_input_tokens_price'] = df.apply(lambda x: calc_input_token_price(x, dec_dict), axis=1)
-    df['%depeg'] = df.apply(lambda x: calc_depeg(x), axis=1)
+    df = add_depeg(df, dec_dict)
     df["network"] = network
-    df["date"] = pd.to_datetime(df['liquidityPools_dailySnapshots_timestamp'], unit="s")
+    df["date"] = pd.to_datetime(df['liquidityPools_dailySnapshots_timestamp'].astype('int64'), unit="s")
 
     return df
 
+def add_depeg(df, dec_dict):
+    df['daily_input_tokens_price'] = df.apply(lambda x: calc_input_token_price(x, dec_dict), axis=1)
+    df['%depeg'] = df.apply(lambda x: calc_depeg(x), axis=1)
+    return df
+
 def calc_depeg(df):
 
     return [round((1 - float(df['daily_input_tokens_price'][i])), 5) for i in range(len(df['input_tokens_name']))]
@@ -94,6 +111,7 @@ def calc_input_token_price(df, dict):
     return input_token_prices
 
 
+@traced()
 def plot_pools(sort, data):
     grouped = data.groupby('liquidityPools_symbol')
     pool_snapshots = [group for _, group in grouped]
@@ -147,6 +165,7 @@ def plot_pools(sort, data):
             st.altair_chart(tvl_chart, use_container_width=True)
             st.altair_chart(fig, use_container_width=True)
 
+TRACE = start_trace("curve-pool-depeg")
 st.title("Curve Pool Composition Dashboard")
 
 #Sidebar Form 
@@ -166,3 +185,6 @@ if submitted:
         start_time = datetime(1970, 1, 1)
     pools = get_data(load_subgraph(subgraphs_urls[network]), network, start_time, number_pools)
     plot_pools(sort, pools)
+
+render_trace_panel(TRACE)
+TRACE.finish()
@@ -1,6 +1,7 @@
-import copy 
 import config
 from utils import *
+from common.downsample import *
+from .templates import *
 from pyecharts import options as opts
 from pyecharts.charts import Bar, Line
 
@@ -13,7 +14,8 @@ class CustomBarChart:
         height="1000px",
         xaxis_namegap=20,
         yaxis_namegap=40,
-        logo_position=70
+        logo_position=70,
+        window=None
     ):
         self.LINE_CHART = Line()
         self.BAR_CHART = Bar(
@@ -24,28 +26,16 @@ class CustomBarChart:
             )
         )
         
-        self.DEFAULT_TITLE_OPTS = copy.deepcopy(config.DEFAULT_TITLE_OPTS)
-        self.DEFAULT_LEGEND_OPTS = copy.deepcopy(config.DEFAULT_LEGEND_OPTS)
-        self.DEFAULT_TOOLTIP_OPTS = copy.deepcopy(config.DEFAULT_TOOLTIP_OPTS)
-        self.DEFAULT_TOOLBOX_OPTS = copy.deepcopy(config.DEFAULT_TOOLBOX_OPTS)
-        self.DEFAULT_XAXIS_OPTS = copy.deepcopy(config.DEFAULT_XAXIS_OPTS)
-        self.DEFAULT_YAXIS_OPTS = copy.deepcopy(config.DEFAULT_YAXIS_OPTS)
-        self.DEFAULT_DATAZOOM_OPTS = copy.deepcopy(config.DEFAULT_DATAZOOM_OPTS)
-        
-        
-        self.DEFAULT_TITLE_OPTS.opts[0]['text'] = chart_title
-        self.DEFAULT_LEGEND_OPTS.update(
-            show=False
-        )
-        self.DEFAULT_XAXIS_OPTS.update(
-            name=xaxis_name,
-            nameGap=xaxis_namegap
-        )
-        self.DEFAULT_YAXIS_OPTS.update(
-            name=yaxis_name,
-            nameGap=yaxis_namegap
-        )
-        
+        self.DEFAULT_TITLE_OPTS = overlay(TITLE_TEMPLATE, text=chart_title)
+        self.DEFAULT_LEGEND_OPTS = overlay(LEGEND_TEMPLATE, show=False)
+        self.DEFAULT_TOOLTIP_OPTS = overlay(TOOLTIP_TEMPLATE)
+        self.DEFAULT_TOOLBOX_OPTS = overlay(TOOLBOX_TEMPLATE)
+        self.DEFAULT_XAXIS_OPTS = overlay(XAXIS_TEMPLATE, name=xaxis_name, nameGap=xaxis_namegap)
+        self.DEFAULT_YAXIS_OPTS = overlay(YAXIS_TEMPLATE, name=yaxis_name, nameGap=yaxis_namegap)
+        self.DEFAULT_DATAZOOM_OPTS = zoom_opts(window)
+        self.window = window
+        self.window_range = None
+
         self.BAR_CHART.set_global_opts(
             title_opts=self.DEFAULT_TITLE_OPTS,
             legend_opts=self.DEFAULT_LEGEND_OPTS,
@@ -61,23 +51,38 @@ class CustomBarChart:
     
     def add_xaxis_bar_chart(self, xaxis_data):
         self.BAR_CHART.add_xaxis(xaxis_data)
+        self.window_range = window_range(xaxis_data, self.window)
     
-    def add_yaxis_bar_chart(self, series_name, color, yaxis_data):
+    def add_yaxis_bar_chart(self, series_name, color, yaxis_data, max_points=config.CHART_MAX_POINTS):
         self.BAR_CHART.add_yaxis(
             series_name=series_name,
             y_axis=yaxis_data,
+            sampling="max",
             itemstyle_opts=opts.ItemStyleOpts(color=color),
             label_opts=opts.LabelOpts(is_show=False)
         )
+        keep_points(
+            self.BAR_CHART,
+            yaxis_data,
+            visible_indices(minmax_indices, yaxis_data, max_points, self.window_range),
+        )
     
-    def add_yaxis_line_chart(self, series_name, color, yaxis_data):
+    def add_yaxis_line_chart(self, series_name, color, yaxis_data, max_points=config.CHART_MAX_POINTS):
         self.LINE_CHART.add_yaxis(
             series_name=series_name,
             y_axis=yaxis_data,
+            sampling="lttb",
             yaxis_index=1,
             itemstyle_opts=opts.ItemStyleOpts(color=color),
             label_opts=opts.LabelOpts(is_show=False)
         )
+        # Overlapped on the bars, whose x-axis is the one drawn
+        keep_points(
+            self.LINE_CHART,
+            yaxis_data,
+            visible_indices(lttb_indices, yaxis_data, max_points, self.window_range),
+            axis_chart=self.BAR_CHART,
+        )
     
     def extend_axis(self, name):
         self.BAR_CHART.extend_axis(
@@ -1,6 +1,5 @@
-import copy
-import config 
 from utils import *
+from .templates import *
 from pyecharts.charts import Pie
 from pyecharts import options as opts
 
@@ -22,32 +21,18 @@ class CustomPieChart:
             )
         )
         
-        self.DEFAULT_TITLE_OPTS = copy.deepcopy(config.DEFAULT_TITLE_OPTS)
-        self.DEFAULT_LEGEND_OPTS = copy.deepcopy(config.DEFAULT_LEGEND_OPTS)
-        self.DEFAULT_TOOLTIP_OPTS = copy.deepcopy(config.DEFAULT_TOOLTIP_OPTS)
-        self.DEFAULT_TOOLBOX_OPTS = copy.deepcopy(config.DEFAULT_TOOLBOX_OPTS)
-        self.DEFAULT_XAXIS_OPTS = copy.deepcopy(config.DEFAULT_XAXIS_OPTS)
-        self.DEFAULT_YAXIS_OPTS = copy.deepcopy(config.DEFAULT_YAXIS_OPTS)
-        self.DEFAULT_DATAZOOM_OPTS = copy.deepcopy(config.DEFAULT_DATAZOOM_OPTS)
-        
-        self.DEFAULT_LEGEND_OPTS.update(
-            show=True
-        )
-        self.DEFAULT_TOOLTIP_OPTS.update(
+        self.DEFAULT_TITLE_OPTS = overlay(TITLE_TEMPLATE, text=chart_title)
+        self.DEFAULT_LEGEND_OPTS = overlay(LEGEND_TEMPLATE, show=True)
+        self.DEFAULT_TOOLTIP_OPTS = overlay(
+            TOOLTIP_TEMPLATE,
             show=True,
             trigger="item",
             formatter="{b}: {d}%"
         )
-        
-        self.DEFAULT_TITLE_OPTS.opts[0]['text'] = chart_title
-        self.DEFAULT_XAXIS_OPTS.opts.update(
-            name=xaxis_name,
-            nameGap=xaxis_namegap
-        )
-        self.DEFAULT_YAXIS_OPTS.update(
-            name=yaxis_name,
-            nameGap=yaxis_namegap
-        )
+        self.DEFAULT_TOOLBOX_OPTS = overlay(TOOLBOX_TEMPLATE)
+        self.DEFAULT_XAXIS_OPTS = overlay(XAXIS_TEMPLATE, name=xaxis_name, nameGap=xaxis_namegap)
+        self.DEFAULT_YAXIS_OPTS = overlay(YAXIS_TEMPLATE, name=yaxis_name, nameGap=yaxis_namegap)
+        self.DEFAULT_DATAZOOM_OPTS = overlay(DATAZOOM_TEMPLATE)
 
         self.PIE_CHART.set_global_opts(
             title_opts=self.DEFAULT_TITLE_OPTS,
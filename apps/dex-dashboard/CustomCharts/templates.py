@@ -0,0 +1,48 @@
+import config
+from types import MappingProxyType
+
+
+def freeze(options):
+    """
+    Read-only view of the top-level fields of a pyecharts options object, or a
+    tuple of views for options holding several items (titles, data zooms).
+    """
+    options = getattr(options, "opts", options)
+    if isinstance(options, (list, tuple)):
+        return tuple(freeze(item) for item in options)
+
+    return MappingProxyType(dict(options))
+
+
+def overlay(template, **overrides):
+    """
+    Chart-local options made of the template's top-level fields plus
+    `overrides`. Nested option objects are shared with the template, so they
+    must never be mutated in place.
+    """
+    if isinstance(template, tuple):
+        return [overlay(item, **overrides) for item in template]
+
+    return {**template, **overrides}
+
+
+def zoom_opts(window=None):
+    """
+    Data zoom options showing the `window` (first, last) categories, or the
+    whole axis without one.
+    """
+    if window is None:
+        return overlay(DATAZOOM_TEMPLATE)
+
+    # Percentages would take precedence over the category values
+    return overlay(DATAZOOM_TEMPLATE, start=None, end=None, startValue=window[0], endValue=window[1])
+
+
+# Built once at import, every chart only copies the top level of these
+TITLE_TEMPLATE = freeze(config.DEFAULT_TITLE_OPTS)
+LEGEND_TEMPLATE = freeze(config.DEFAULT_LEGEND_OPTS)
+TOOLTIP_TEMPLATE = freeze(config.DEFAULT_TOOLTIP_OPTS)
+TOOLBOX_TEMPLATE = freeze(config.DEFAULT_TOOLBOX_OPTS)
+XAXIS_TEMPLATE = freeze(config.DEFAULT_XAXIS_OPTS)
+YAXIS_TEMPLATE = freeze(config.DEFAULT_YAXIS_OPTS)
+DATAZOOM_TEMPLATE = freeze(config.DEFAULT_DATAZOOM_OPTS)
@@ -1,12 +1,26 @@
+import os
+import sys
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
 from config import *
+from batch import QueryBatcher
+from cache import CHART_SPECS
+from common.downsample import zoom_window
+from common.introspection import SCHEMAS
+from common.tracing import render_trace_panel, section, start_trace
 from st_aggrid import AgGrid
 from subgrounds.subgrounds import Subgrounds
 from tables import DepositTransactions, SwapTransactions, WithdawTransactions
 from metrics import FinancialsDailySnapshots, LiquidityPools, MetricsDailySnapshots
 
 import streamlit as st
-from streamlit_echarts import st_pyecharts
+from streamlit_echarts import st_echarts
 st.set_page_config(layout="wide")
+TRACE = start_trace("dex-dashboard")
 
 st.title("DEX Subgraphs Dashboard")
 
@@ -20,78 +34,112 @@ subgraph_name = st.selectbox(
 
 
 SUBGROUND = Subgrounds()
-SUBGRAPH = SUBGROUND.load_subgraph(SUBGRAPH_API_URL[subgraph_name])
-
-FinancialsSnapshot = FinancialsDailySnapshots(SUBGRAPH, SUBGROUND, initial_timestamp=1601322741)
+with section("load_subgraph"):
+    SUBGRAPH = SCHEMAS.load_subgraph(SUBGROUND, SUBGRAPH_API_URL[subgraph_name])
+INITIAL_TIMESTAMP = 1601322741
+
+# Sent back by the time series charts on every zoom: the window in percent of
+# the x-axis, and the time of the zoom to tell it from the last one
+ZOOM_EVENTS = {
+    "datazoom": """
+        function (params) {
+            let zoom = params.batch ? params.batch[0] : params;
+
+            return [zoom.start, zoom.end, Date.now()];
+        };
+    """
+}
+
+
+def zoomable_chart(build, dataframe, key):
+    """
+    Renders the chart of `build`, downsampled over its whole range and at
+    full resolution within the window the user zoomed into. A zoom reruns the
+    page with the new window, so it is drawn from the raw series.
+    """
+    zoom = st.session_state.setdefault(f"{key}Zoom", {"window": None, "event": None})
+    options = CHART_SPECS.get_or_build(build, SUBGRAPH._url, dataframe, window=zoom["window"])
+    event = st_echarts(options=options, height="450px", key=key, events=ZOOM_EVENTS)
+
+    if isinstance(event, list) and event != zoom["event"]:
+        zoom["event"] = event
+        zoom["window"] = zoom_window(options["xAxis"][0]["data"], event[0], event[1])
+        st.experimental_rerun()
+
+
+# All sections of the page are fetched in a single GraphQL round trip
+batch = QueryBatcher(SUBGROUND)
+batch.add("financials", FinancialsDailySnapshots.section(SUBGRAPH, INITIAL_TIMESTAMP))
+batch.add("usage", MetricsDailySnapshots.section(SUBGRAPH, INITIAL_TIMESTAMP))
+batch.add("pools_by_tvl", LiquidityPools.section(SUBGRAPH, SUBGRAPH.LiquidityPool.totalValueLockedUSD))
+batch.add("pools_by_volume", LiquidityPools.section(SUBGRAPH, SUBGRAPH.LiquidityPool.cumulativeVolumeUSD))
+batch.add("swaps", SwapTransactions.section(SUBGRAPH))
+batch.add("deposits", DepositTransactions.section(SUBGRAPH))
+batch.add("withdraws", WithdawTransactions.section(SUBGRAPH))
+with section("batch_query") as trace_section:
+    DATAFRAMES = batch.execute()
+    trace_section["rows"] = sum(len(dataframe) for dataframe in DATAFRAMES.values())
+
+with section("financials"):
+    FinancialsSnapshot = FinancialsDailySnapshots(
+        SUBGRAPH, SUBGROUND, initial_timestamp=INITIAL_TIMESTAMP, dataframe=DATAFRAMES["financials"]
+    )
 
 col1, col2 = st.columns(2)
 
 with col1:
-    st_pyecharts(
-        chart=FinancialsSnapshot.tvl_chart(),
-        height="450px",
-        key="TVLChart",
-    )
+    zoomable_chart(FinancialsSnapshot.tvl_chart, FinancialsSnapshot.dataframe, key="TVLChart")
 
 with col2:
-    st_pyecharts(
-        chart=FinancialsSnapshot.volume_chart(),
-        height="450px",
-        key="VolumeChart",
-    )
+    zoomable_chart(FinancialsSnapshot.volume_chart, FinancialsSnapshot.dataframe, key="VolumeChart")
 
 col1, col2 = st.columns(2)
 
 with col1:
-    st_pyecharts(
-        chart=FinancialsSnapshot.revenue_chart(),
-        height="450px",
-        key="RevenueChart",
-    )
+    zoomable_chart(FinancialsSnapshot.revenue_chart, FinancialsSnapshot.dataframe, key="RevenueChart")
 
 with col2:
-    st_pyecharts(
-        chart=FinancialsSnapshot.cumulative_revenue_chart(),
-        height="450px",
-        key="CumulativeRevenueChart",
-    )
+    zoomable_chart(FinancialsSnapshot.cumulative_revenue_chart, FinancialsSnapshot.dataframe, key="CumulativeRevenueChart")
 
 
-MetricsSnapshot = MetricsDailySnapshots(SUBGRAPH, SUBGROUND, initial_timestamp=1601322741)
+with section("usage"):
+    MetricsSnapshot = MetricsDailySnapshots(
+        SUBGRAPH, SUBGROUND, initial_timestamp=INITIAL_TIMESTAMP, dataframe=DATAFRAMES["usage"]
+    )
 
 with st.container():
-    st_pyecharts(
-        chart=MetricsSnapshot.transactions_count_chart(),
-        height="450px",
-        key="TransactionChart",
-    )
+    zoomable_chart(MetricsSnapshot.transactions_count_chart, MetricsSnapshot.dataframe, key="TransactionChart")
 
 with st.container():
-    st_pyecharts(
-        chart=MetricsSnapshot.active_users_chart(),
-        height="450px",
-        key="ActiveUsersChart",
+    zoomable_chart(MetricsSnapshot.active_users_chart, MetricsSnapshot.dataframe, key="ActiveUsersChart")
+
+with section("pools"):
+    liquidity_pool = LiquidityPools(
+        SUBGRAPH,
+        SUBGROUND,
+        initial_timestamp=INITIAL_TIMESTAMP,
+        dataframe_tvl=DATAFRAMES["pools_by_tvl"],
+        dataframe_volume=DATAFRAMES["pools_by_volume"],
     )
 
-liquidity_pool = LiquidityPools(SUBGRAPH, SUBGROUND, initial_timestamp=1601322741)
-
 col1, col2 = st.columns(2)
 
 with col1:
-    st_pyecharts(
-        chart=liquidity_pool.top_10_pools_by_tvl(),
+    st_echarts(
+        options=CHART_SPECS.get_or_build(liquidity_pool.top_10_pools_by_tvl, SUBGRAPH._url, liquidity_pool.dataframe_tvl),
         height="450px",
         key="Top10ByTVL",
     )
 
 with col2:
-    st_pyecharts(
-        chart=liquidity_pool.top_10_pools_by_volume(),
+    st_echarts(
+        options=CHART_SPECS.get_or_build(liquidity_pool.top_10_pools_by_volume, SUBGRAPH._url, liquidity_pool.dataframe_volume),
         height="450px",
         key="Top10ByVolume",
     )
 
-swap = SwapTransactions(SUBGRAPH, SUBGROUND)
+with section("swaps"):
+    swap = SwapTransactions(SUBGRAPH, SUBGROUND, dataframe=DATAFRAMES["swaps"])
 
 if not swap.dataframe.empty:
     st.header("Swap Transactions")
@@ -106,7 +154,8 @@ if not swap.dataframe.empty:
             theme="streamlit"
         )
 
-deposits = DepositTransactions(SUBGRAPH, SUBGROUND)
+with section("deposits"):
+    deposits = DepositTransactions(SUBGRAPH, SUBGROUND, dataframe=DATAFRAMES["deposits"])
 
 if not deposits.dataframe.empty:
     st.header("Deposit Transactions")
@@ -121,7 +170,8 @@ if not deposits.dataframe.empty:
             theme="streamlit"
         )
 
-withdraws = WithdawTransactions(SUBGRAPH, SUBGROUND)
+with section("withdraws"):
+    withdraws = WithdawTransactions(SUBGRAPH, SUBGROUND, dataframe=DATAFRAMES["withdraws"])
 
 if not withdraws.dataframe.empty:
     st.header("Withdraw Transactions")
@@ -134,4 +184,7 @@ if not withdraws.dataframe.empty:
             update_mode="no_update",
             fit_columns_on_grid_load=True, 
             theme="streamlit"
-        )
\ No newline at end of file
+        )
+
+render_trace_panel(TRACE)
+TRACE.finish()
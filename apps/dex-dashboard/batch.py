@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+from subgrounds.dataframe_utils import df_of_json
+from subgrounds.subgraph import FieldPath
+
+from cache import QUERY_CACHE
+
+# `rest(subground, dataframe)` optionally fetches what follows a section's first
+# page, `merge` optionally post-processes the section dataframe before it is cached
+Section = namedtuple("Section", ["key", "fieldpaths", "merge", "rest"], defaults=[None, None])
+
+
+class QueryBatcher:
+    """
+    Collects the field paths of every section of a page and sends them to the
+    subgraph as a single GraphQL document.
+
+    Subgrounds gives every field with arguments its own alias, so sections
+    querying the same entity with different arguments (e.g. pools ordered by
+    TVL and by volume) can share one document. The response is then split back
+    into one dataframe per section. Sections that are still fresh in the query
+    cache are left out of the document, and so are sections another session
+    is already fetching, whose result is waited for instead.
+
+    Subgrounds' pagination is off, as it would send one request per list: each
+    list asks for at most one page (`first` <= 1000), and a section that needs
+    more, such as a long snapshot history, fetches the following pages itself
+    through its `rest` callback.
+    """
+
+    def __init__(self, subground, cache=QUERY_CACHE):
+        self.subground = subground
+        self.cache = cache
+        self.sections = {}
+
+    def add(self, name, section):
+        self.sections[name] = section
+
+    def execute(self):
+        names = {section.key: name for name, section in self.sections.items()}
+        dataframes = self.cache.get_or_fetch_many(names, self.fetch)
+        return {names[key]: dataframe for key, dataframe in dataframes.items()}
+
+    def fetch(self, keys):
+        pending = {section.key: section for section in self.sections.values() if section.key in keys}
+        fieldpaths = {
+            key: self.expand(section.fieldpaths) for key, section in pending.items()
+        }
+
+        # One round trip for every section that missed the cache
+        json_data = self.subground.query_json(
+            [fpath for fpaths in fieldpaths.values() for fpath in fpaths],
+            auto_paginate=False,
+        )
+
+        dataframes = {}
+        for key, section in pending.items():
+            dataframe = df_of_json(json_data, fieldpaths[key])
+            if section.rest is not None:
+                dataframe = section.rest(self.subground, dataframe)
+            if section.merge is not None:
+                dataframe = section.merge(dataframe)
+            dataframes[key] = dataframe
+
+        return dataframes
+
+    @staticmethod
+    def expand(fieldpaths):
+        expanded = []
+        for fpath in fieldpaths:
+            selected = FieldPath._auto_select(fpath)
+            expanded.extend(selected if isinstance(selected, list) else [selected])
+
+        return expanded
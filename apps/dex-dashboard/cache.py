@@ -0,0 +1,192 @@
+import time
+import threading
+from collections import OrderedDict
+
+import config
+import pandas as pd
+import simplejson as json
+from pyecharts.charts.base import default
+
+from common.coalesce import Coalescer
+from common.tracing import count, section
+from utils import dataframe_fingerprint
+
+
+class QueryCache:
+    """
+    Process-wide cache of subgraph query results.
+
+    Streamlit re-executes `app.py` on every widget interaction and for every
+    viewer, but imported modules stay loaded, so a module-level instance is
+    shared by all sessions of the process. Entries are keyed by
+    (subgraph url, entity, query params), expire after a per-entity TTL and
+    are evicted least-recently-used once the total size of the cached
+    dataframes exceeds `max_bytes`.
+
+    Concurrent misses on the same key are coalesced: the first caller runs
+    the query while the others wait for its result, so N viewers of the same
+    protocol cost one upstream query per TTL window. This holds for batches
+    of keys fetched by a single query too.
+
+    Cached dataframes are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, ttl_sec, default_ttl_sec=60, max_bytes=256 * 1024 * 1024):
+        self.ttl_sec = ttl_sec
+        self.default_ttl_sec = default_ttl_sec
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._loads = Coalescer()
+
+    @staticmethod
+    def make_key(url, entity, **params):
+        return (url, entity, tuple(sorted((k, repr(v)) for k, v in params.items())))
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._evict(key)
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        entity = key[1]
+        ttl = self.ttl_sec.get(entity, self.default_ttl_sec)
+        size = self._sizeof(value)
+
+        with self._lock:
+            if key in self.entries:
+                self._evict(key)
+
+            # A single result larger than the budget is returned but not kept
+            if size > self.max_bytes:
+                return
+
+            self.entries[key] = (value, size, time.monotonic() + ttl)
+            self.size_bytes += size
+
+            while self.size_bytes > self.max_bytes:
+                self._evict(next(iter(self.entries)))
+
+    def get_or_fetch(self, key, fetch):
+        return self.get_or_fetch_many([key], lambda missing: {key: fetch()})[key]
+
+    def get_or_fetch_many(self, keys, fetch):
+        """
+        {key: value} of `keys`, the ones missing fetched together by
+        `fetch(missing)`, which returns {key: value} for them.
+        """
+        return self._loads.get_many(keys, self._lookup, lambda missing: self._fetch(missing, fetch))
+
+    def _lookup(self, key):
+        value = self.get(key)
+        if value is None:
+            return False, None
+
+        with self._lock:
+            self.hits += 1
+        return True, value
+
+    def _fetch(self, keys, fetch):
+        with self._lock:
+            self.misses += len(keys)
+
+        fetched = fetch(keys)
+        for key in keys:
+            self.put(key, fetched[key])
+        return {key: fetched[key] for key in keys}
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size_bytes = 0
+
+    def _evict(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size_bytes -= size
+
+    @staticmethod
+    def _sizeof(value):
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, (list, tuple)):
+            return sum(QueryCache._sizeof(v) for v in value)
+        return 0
+
+
+class ChartSpecCache:
+    """
+    Serialized ECharts options of the page charts, keyed by
+    (chart method, subgraph url, fingerprint of the input dataframes, keyword
+    arguments of the chart method such as its zoom window).
+
+    Reruns with unchanged data skip both the pyecharts chart construction and
+    its JSON serialization, the cached options are handed to `st_echarts`
+    directly (which is what `st_pyecharts` does after serializing).
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    def get_or_build(self, chart_method, subgraph_url, *dataframes, **kwargs):
+        with section(f"chart:{chart_method.__name__}"):
+            key = (
+                chart_method.__qualname__,
+                subgraph_url,
+                tuple(dataframe_fingerprint(dataframe) for dataframe in dataframes),
+                tuple(sorted(kwargs.items())),
+            )
+
+            with self._lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+
+            if entry is not None:
+                count(cache_hits=1)
+            else:
+                self.misses += 1
+                count(cache_misses=1)
+                chart = chart_method(**kwargs)
+                serialized = json.dumps(chart.get_options(), default=default, ignore_nan=True)
+                # The serialized size is kept as the payload sent to the browser
+                entry = (json.loads(serialized), len(serialized))
+
+                with self._lock:
+                    self.entries[key] = entry
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+
+            options, payload_bytes = entry
+            count(payload_bytes=payload_bytes)
+
+        return options
+
+
+QUERY_CACHE = QueryCache(
+    ttl_sec=config.QUERY_CACHE_TTL_SEC,
+    default_ttl_sec=config.QUERY_CACHE_DEFAULT_TTL_SEC,
+    max_bytes=config.QUERY_CACHE_MAX_BYTES,
+)
+
+CHART_SPECS = ChartSpecCache(max_entries=config.CHART_SPEC_CACHE_SIZE)
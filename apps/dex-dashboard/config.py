@@ -10,6 +10,28 @@ SUBGRAPH_API_URL = {
     'Uniswap v3 (Ethereum)': "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-ethereum"
 }
 
+# Seconds a cached query result stays fresh, per queried entity
+QUERY_CACHE_TTL_SEC = {
+    'financialsDailySnapshots': 10 * 60,
+    'usageMetricsDailySnapshots': 10 * 60,
+    'liquidityPools': 5 * 60,
+    'swaps': 30,
+    'deposits': 30,
+    'withdraws': 30,
+}
+QUERY_CACHE_DEFAULT_TTL_SEC = 60
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Download the next page of daily snapshots while the current one is decoded
+SNAPSHOTS_PREFETCH_PAGES = True
+
+# Serialized chart options kept for reruns whose data did not change
+CHART_SPEC_CACHE_SIZE = 128
+
+# Points sent to the browser per time series, beyond which the series is
+# downsampled (LTTB for lines, min-max for bars). None sends every point.
+CHART_MAX_POINTS = 1000
+
 DEFAULT_TITLE_OPTS = opts.TitleOpts(
     padding=10,
     item_gap=0,
@@ -1,29 +1,85 @@
 from utils import *
 from config import *
+from cache import QUERY_CACHE
+from pagination import MAX_PAGE_SIZE, fetch_all, fetch_rest
+from common.incremental import SNAPSHOTS
+from batch import Section
 
 from CustomCharts import CustomLineChart, CustomBarChart, CustomPieChart
 
 class FinancialsDailySnapshots:
-    def __init__(self, subgraph, subground, initial_timestamp):
+    def __init__(self, subgraph, subground, initial_timestamp, dataframe=None):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
 
-        self.dataframe = self.query()
+        self.dataframe = self.query() if dataframe is None else dataframe
 
-    def query(self):
-        financial_daily_snapshot = self.subgraph.Query.financialsDailySnapshots(
-            first=1000,
-            where=[self.subgraph.FinancialsDailySnapshot.timestamp > self.timestamp],
+    @staticmethod
+    def cache_key(subgraph, initial_timestamp):
+        return QUERY_CACHE.make_key(
+            subgraph._url, "financialsDailySnapshots",
+            where={"timestamp_gt": initial_timestamp}, orderBy="timestamp",
         )
 
-        dataframe = self.subground.query_df([financial_daily_snapshot])
+    @staticmethod
+    def section(subgraph, initial_timestamp):
+        key = FinancialsDailySnapshots.cache_key(subgraph, initial_timestamp)
+        id_column = "financialsDailySnapshots_id"
+
+        # First page only, the batch fetches the rest with the cursor paginator
+        financial_daily_snapshot = subgraph.Query.financialsDailySnapshots(
+            first=MAX_PAGE_SIZE,
+            orderBy=subgraph.FinancialsDailySnapshot.timestamp,
+            orderDirection="asc",
+            where=[
+                subgraph.FinancialsDailySnapshot.timestamp
+                > SNAPSHOTS.since(key, id_column, initial_timestamp)
+            ],
+        )
 
-        return dataframe
+        return Section(
+            key=key,
+            fieldpaths=[financial_daily_snapshot],
+            merge=lambda dataframe: SNAPSHOTS.merge(key, dataframe, id_column),
+            rest=lambda subground, dataframe: fetch_rest(
+                subground,
+                subgraph,
+                "financialsDailySnapshots",
+                "FinancialsDailySnapshot",
+                dataframe,
+                prefetch=SNAPSHOTS_PREFETCH_PAGES,
+            ),
+        )
+
+    def query(self):
+        key = self.cache_key(self.subgraph, self.timestamp)
+
+        # On expiry only the still-open day and newer ones are downloaded again
+        return QUERY_CACHE.get_or_fetch(
+            key,
+            lambda: SNAPSHOTS.refresh(
+                key,
+                self.query_since,
+                id_column="financialsDailySnapshots_id",
+                initial_timestamp=self.timestamp,
+            ),
+        )
 
-    def tvl_chart(self):
+    def query_since(self, timestamp):
+        return fetch_all(
+            self.subground,
+            self.subgraph,
+            "financialsDailySnapshots",
+            "FinancialsDailySnapshot",
+            cursor_start=timestamp,
+            prefetch=SNAPSHOTS_PREFETCH_PAGES,
+        )
+
+    def tvl_chart(self, window=None):
         chart = CustomLineChart(
-            chart_title="Total Value Locked (USD)", xaxis_name="UTC", yaxis_name="Daily TVL"
+            chart_title="Total Value Locked (USD)", xaxis_name="UTC", yaxis_name="Daily TVL",
+            window=window,
         )
 
         # x_axis --> timestamp
@@ -40,9 +96,10 @@ class FinancialsDailySnapshots:
 
         return chart.LINE_CHART
 
-    def volume_chart(self):
+    def volume_chart(self, window=None):
         chart = CustomLineChart(
-            chart_title="Volume (USD)", xaxis_name="UTC", yaxis_name="Daily Volume"
+            chart_title="Volume (USD)", xaxis_name="UTC", yaxis_name="Daily Volume",
+            window=window,
         )
 
         xaxis_data = format_xaxis(self.dataframe.financialsDailySnapshots_id)
@@ -60,11 +117,12 @@ class FinancialsDailySnapshots:
 
         return chart.LINE_CHART
 
-    def revenue_chart(self):
+    def revenue_chart(self, window=None):
         chart = CustomBarChart(
             chart_title="Revenue (USD)",
             xaxis_name="UTC",
             yaxis_name="Revenue",
+            window=window,
         )
 
         xaxis_data = format_xaxis(self.dataframe.financialsDailySnapshots_id)
@@ -99,12 +157,13 @@ class FinancialsDailySnapshots:
 
         return chart.BAR_CHART.overlap(chart.LINE_CHART)
 
-    def cumulative_revenue_chart(self):
+    def cumulative_revenue_chart(self, window=None):
         chart = CustomLineChart(
             chart_title="Cumulative Revenue (USD)",
             xaxis_name="UTC",
             yaxis_name="Daily Cumulative Revenue",
             yaxis_namegap=45,
+            window=window,
         )
 
         xaxis_data = format_xaxis(self.dataframe.financialsDailySnapshots_id)
@@ -138,29 +197,81 @@ class FinancialsDailySnapshots:
         return chart.LINE_CHART
 
 class MetricsDailySnapshots:
-    def __init__(self, subgraph, subground, initial_timestamp):
+    def __init__(self, subgraph, subground, initial_timestamp, dataframe=None):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
 
-        self.dataframe = self.query()
+        self.dataframe = self.query() if dataframe is None else dataframe
 
-    def query(self):
-        metrics_daily_snapshot = self.subgraph.Query.usageMetricsDailySnapshots(
-            first=1000,
-            where=[self.subgraph.UsageMetricsDailySnapshot.timestamp > self.timestamp],
+    @staticmethod
+    def cache_key(subgraph, initial_timestamp):
+        return QUERY_CACHE.make_key(
+            subgraph._url, "usageMetricsDailySnapshots",
+            where={"timestamp_gt": initial_timestamp}, orderBy="timestamp",
         )
 
-        dataframe = self.subground.query_df([metrics_daily_snapshot])
+    @staticmethod
+    def section(subgraph, initial_timestamp):
+        key = MetricsDailySnapshots.cache_key(subgraph, initial_timestamp)
+        id_column = "usageMetricsDailySnapshots_id"
+
+        # First page only, the batch fetches the rest with the cursor paginator
+        metrics_daily_snapshot = subgraph.Query.usageMetricsDailySnapshots(
+            first=MAX_PAGE_SIZE,
+            orderBy=subgraph.UsageMetricsDailySnapshot.timestamp,
+            orderDirection="asc",
+            where=[
+                subgraph.UsageMetricsDailySnapshot.timestamp
+                > SNAPSHOTS.since(key, id_column, initial_timestamp)
+            ],
+        )
 
-        return dataframe
+        return Section(
+            key=key,
+            fieldpaths=[metrics_daily_snapshot],
+            merge=lambda dataframe: SNAPSHOTS.merge(key, dataframe, id_column),
+            rest=lambda subground, dataframe: fetch_rest(
+                subground,
+                subgraph,
+                "usageMetricsDailySnapshots",
+                "UsageMetricsDailySnapshot",
+                dataframe,
+                prefetch=SNAPSHOTS_PREFETCH_PAGES,
+            ),
+        )
 
-    def transactions_count_chart(self):
+    def query(self):
+        key = self.cache_key(self.subgraph, self.timestamp)
+
+        # On expiry only the still-open day and newer ones are downloaded again
+        return QUERY_CACHE.get_or_fetch(
+            key,
+            lambda: SNAPSHOTS.refresh(
+                key,
+                self.query_since,
+                id_column="usageMetricsDailySnapshots_id",
+                initial_timestamp=self.timestamp,
+            ),
+        )
+
+    def query_since(self, timestamp):
+        return fetch_all(
+            self.subground,
+            self.subgraph,
+            "usageMetricsDailySnapshots",
+            "UsageMetricsDailySnapshot",
+            cursor_start=timestamp,
+            prefetch=SNAPSHOTS_PREFETCH_PAGES,
+        )
+
+    def transactions_count_chart(self, window=None):
         chart = CustomBarChart(
             chart_title="Transactions",
             xaxis_name="UTC",
             yaxis_name="Count Of Transactions",
-            logo_position=130
+            logo_position=130,
+            window=window,
         )
 
         xaxis_data = format_xaxis(self.dataframe.usageMetricsDailySnapshots_id)
@@ -202,12 +313,13 @@ class MetricsDailySnapshots:
 
         return chart.BAR_CHART.overlap(chart.LINE_CHART)
 
-    def active_users_chart(self):
+    def active_users_chart(self, window=None):
         chart = CustomLineChart(
             chart_title="Active Users",
             xaxis_name="UTC",
             yaxis_name="Count Of Users",
-            logo_position=135
+            logo_position=135,
+            window=window,
         )
 
         # x_axis --> timestamp
@@ -225,26 +337,45 @@ class MetricsDailySnapshots:
         return chart.LINE_CHART
 
 class LiquidityPools:
-    def __init__(self, subgraph, subground, initial_timestamp=None):
+    def __init__(
+        self, subgraph, subground, initial_timestamp=None, dataframe_tvl=None, dataframe_volume=None
+    ):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
 
-        self.dataframe_tvl = self.query(orderBy=self.subgraph.LiquidityPool.totalValueLockedUSD)
-        self.dataframe_volume = self.query(orderBy=self.subgraph.LiquidityPool.cumulativeVolumeUSD)
+        if dataframe_tvl is None:
+            dataframe_tvl = self.query(orderBy=self.subgraph.LiquidityPool.totalValueLockedUSD)
+        if dataframe_volume is None:
+            dataframe_volume = self.query(orderBy=self.subgraph.LiquidityPool.cumulativeVolumeUSD)
 
-    def query(self, orderBy):
-        pools = self.subgraph.Query.liquidityPools(
+        self.dataframe_tvl = dataframe_tvl
+        self.dataframe_volume = dataframe_volume
+
+    @staticmethod
+    def section(subgraph, orderBy):
+        pools = subgraph.Query.liquidityPools(
             first=10,
             orderBy=orderBy,
             orderDirection="desc",
         )
 
-        dataframe = self.subground.query_df(
-            [pools.id, pools.name, pools.totalValueLockedUSD, pools.cumulativeVolumeUSD]
+        key = QUERY_CACHE.make_key(
+            subgraph._url, "liquidityPools",
+            orderBy=orderBy._name(), orderDirection="desc", first=10,
+        )
+
+        return Section(
+            key=key,
+            fieldpaths=[pools.id, pools.name, pools.totalValueLockedUSD, pools.cumulativeVolumeUSD],
         )
 
-        return dataframe
+    def query(self, orderBy):
+        section = self.section(self.subgraph, orderBy)
+
+        return QUERY_CACHE.get_or_fetch(
+            section.key, lambda: self.subground.query_df(section.fieldpaths)
+        )
 
     def top_10_pools_by_tvl(self):
         chart = CustomPieChart(
@@ -0,0 +1,109 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# The Graph rejects `first` values above 1000
+MAX_PAGE_SIZE = 1000
+
+
+def last_cursor(dataframe, cursor_column):
+    cursor = dataframe[cursor_column].iloc[-1]
+    # Subgrounds only formats plain Python values as query arguments
+    return cursor.item() if hasattr(cursor, "item") else cursor
+
+
+def iter_pages(
+    subground,
+    subgraph,
+    entity,
+    entity_type,
+    cursor_field="timestamp",
+    cursor_start=0,
+    page_size=MAX_PAGE_SIZE,
+    prefetch=False,
+):
+    """
+    Streams `entity` (e.g. financialsDailySnapshots) as one dataframe per page,
+    walking the collection in ascending `cursor_field` order with a
+    `<cursor_field>_gt` filter instead of a growing `skip`.
+
+    With `prefetch=True` the request for the next page is sent in the
+    background as soon as the cursor of the current page is known, so the
+    caller's processing of a page overlaps with the download of the next one.
+    """
+    fields = getattr(subgraph, entity_type)
+    cursor_column = f"{entity}_{cursor_field}"
+
+    def fetch(cursor):
+        page = getattr(subgraph.Query, entity)(
+            first=page_size,
+            orderBy=getattr(fields, cursor_field),
+            orderDirection="asc",
+            where=[getattr(fields, cursor_field) > cursor],
+        )
+        # Subgrounds' own pagination is disabled, the cursor replaces it
+        return subground.query_df([page], auto_paginate=False)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        dataframe = fetch(cursor_start)
+
+        while True:
+            is_last_page = len(dataframe) < page_size
+
+            next_page = None
+            if executor is not None and not is_last_page:
+                # Run in the caller's context so the request is traced with it
+                next_page = executor.submit(
+                    contextvars.copy_context().run, fetch, last_cursor(dataframe, cursor_column)
+                )
+
+            yield dataframe
+
+            if is_last_page:
+                return
+
+            if next_page is not None:
+                dataframe = next_page.result()
+            else:
+                dataframe = fetch(last_cursor(dataframe, cursor_column))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_all(subground, subgraph, entity, entity_type, **kwargs):
+    """
+    Fetches every page of `entity` and concatenates them once into a single
+    dataframe, rather than growing a frame page by page.
+    """
+    pages = list(iter_pages(subground, subgraph, entity, entity_type, **kwargs))
+
+    if len(pages) == 1:
+        return pages[0]
+
+    return pd.concat(pages, ignore_index=True)
+
+
+def fetch_rest(subground, subgraph, entity, entity_type, first_page, cursor_field="timestamp",
+               page_size=MAX_PAGE_SIZE, **kwargs):
+    """
+    Completes `first_page`, a page of `entity` already fetched in ascending
+    `cursor_field` order (e.g. as part of a batched query), with the pages
+    after it. A short page is the whole collection and is returned as is.
+    """
+    if len(first_page) < page_size:
+        return first_page
+
+    pages = iter_pages(
+        subground,
+        subgraph,
+        entity,
+        entity_type,
+        cursor_field=cursor_field,
+        cursor_start=last_cursor(first_page, f"{entity}_{cursor_field}"),
+        page_size=page_size,
+        **kwargs,
+    )
+    return pd.concat([first_page, *pages], ignore_index=True)
@@ -1,130 +1,145 @@
-import pandas as pd
+from batch import Section
+from cache import QUERY_CACHE
+from common.decode import decode
+from common.schema import DEX_AMM_SCHEMA_PATH, Projection
 
 class SwapTransactions:
-    def __init__(self, subgraph, subground, initial_timestamp=None):
+    columns_order = [
+        'Date', 'blockNumber', 'from', 'tokenIn', 'amountIn',
+        'amountInUSD', 'tokenOut', 'amountOut', 'amountOutUSD'
+    ]
+    projection = Projection("Swap", columns_order, DEX_AMM_SCHEMA_PATH, aliases={"Date": "timestamp"})
+
+    def __init__(self, subgraph, subground, initial_timestamp=None, dataframe=None):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
-        self.columns_order = [
-            'Date', 'blockNumber', 'from', 'tokenIn', 'amountIn',
-            'amountInUSD', 'tokenOut', 'amountOut', 'amountOutUSD'
-        ]
-        self.dataframe = self.query()
+        self.dataframe = self.query() if dataframe is None else self.format(dataframe)
 
-    def query(self):
-        swaps = self.subgraph.Query.swaps(
+    @classmethod
+    def section(cls, subgraph):
+        swaps = subgraph.Query.swaps(
             first=15,
-            orderBy=self.subgraph.Swap.timestamp,
+            orderBy=subgraph.Swap.timestamp,
             orderDirection="desc",
         )
 
-        dataframe = self.subground.query_df([swaps])
-        
+        key = QUERY_CACHE.make_key(
+            subgraph._url, "swaps", orderBy="timestamp", orderDirection="desc", first=15
+        )
+
+        return Section(key=key, fieldpaths=cls.projection.select(swaps))
+
+    def query(self):
+        section = self.section(self.subgraph)
+
+        dataframe = QUERY_CACHE.get_or_fetch(
+            section.key, lambda: self.subground.query_df(section.fieldpaths)
+        )
+
+        return self.format(dataframe)
+
+    def format(self, dataframe):
         if dataframe.empty:
             return dataframe
-        
-        dataframe.columns = [
-            "id", "hash", "logIndex", "protocol_id", "to", "from", "blockNumber", "Date", "tokenIn",
-            "amountIn", "amountInUSD", "tokenOut", "amountOut", "amountOutUSD", "pool_id",
-        ]
-
-        dataframe.drop(
-            ["id", "to", "logIndex", "protocol_id", "pool_id"], axis=1, inplace=True
-        )
-        dataframe['hash'] = dataframe['hash'].map(str)
-        dataframe['blockNumber'] = dataframe['blockNumber'].map(int)
-        dataframe['Date'] = pd.to_datetime(dataframe['Date'].map(int), unit='s')
-        dataframe['tokenIn'] = dataframe['tokenIn'].map(str)
-        dataframe['amountIn'] = dataframe['amountIn'].map(str)
-        dataframe['amountInUSD'] = dataframe['amountInUSD'].map(float)
-        dataframe['tokenOut'] = dataframe['tokenOut'].map(str)
-        dataframe['amountOut'] = dataframe['amountOut'].map(str)
-        dataframe['amountOutUSD'] = dataframe['amountOutUSD'].map(float)
-
-        dataframe = dataframe.reindex(columns=self.columns_order)
-        
-        return dataframe
+
+        # rename() builds a new frame, the raw one is shared through the query cache
+        dataframe = self.projection.rename(dataframe, "swaps")
+
+        return decode(dataframe, self.projection.scalars)
 
 class DepositTransactions:
-    def __init__(self, subgraph, subground, initial_timestamp=None):
+    columns_order = [
+        'Date', 'blockNumber', 'from', 'outputToken', 'outputTokenAmount',
+        'outputTokenAmountUSD'
+    ]
+    projection = Projection(
+        "Deposit", columns_order, DEX_AMM_SCHEMA_PATH,
+        aliases={"Date": "timestamp", "outputTokenAmountUSD": "amountUSD"},
+    )
+
+    def __init__(self, subgraph, subground, initial_timestamp=None, dataframe=None):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
-        self.columns_order = [
-            'Date', 'blockNumber', 'from', 'outputToken', 'outputTokenAmount',
-            'outputTokenAmountUSD'
-        ]
-        self.dataframe = self.query()
+        self.dataframe = self.query() if dataframe is None else self.format(dataframe)
 
-    def query(self):
-        swaps = self.subgraph.Query.deposits(
+    @classmethod
+    def section(cls, subgraph):
+        deposits = subgraph.Query.deposits(
             first=15,
-            orderBy=self.subgraph.Deposit.timestamp,
+            orderBy=subgraph.Deposit.timestamp,
             orderDirection="desc",
         )
 
-        dataframe = self.subground.query_df([swaps])
+        key = QUERY_CACHE.make_key(
+            subgraph._url, "deposits", orderBy="timestamp", orderDirection="desc", first=15
+        )
+
+        return Section(key=key, fieldpaths=cls.projection.select(deposits))
+
+    def query(self):
+        section = self.section(self.subgraph)
+
+        dataframe = QUERY_CACHE.get_or_fetch(
+            section.key, lambda: self.subground.query_df(section.fieldpaths)
+        )
+
+        return self.format(dataframe)
 
+    def format(self, dataframe):
         if dataframe.empty:
             return dataframe
-        
-        dataframe.columns = [
-            'id', 'hash', 'logIndex','protocol_id', 'to', 'from', 'blockNumber', 
-            'Date', 'outputToken', 'outputTokenAmount', 'outputTokenAmountUSD', 'pool_id'
-        ]
-
-        dataframe.drop(
-            ["id", "to", "logIndex", "protocol_id", "pool_id"], axis=1, inplace=True
-        )
-        dataframe['hash'] = dataframe['hash'].map(str)
-        dataframe['blockNumber'] = dataframe['blockNumber'].map(int)
-        dataframe['Date'] = pd.to_datetime(dataframe['Date'].map(int), unit='s')
-        dataframe['outputToken'] = dataframe['outputToken'].map(str)
-        dataframe['outputTokenAmount'] = dataframe['outputTokenAmount'].map(float)
-        dataframe['outputTokenAmountUSD'] = dataframe['outputTokenAmountUSD'].map(str)
 
-        dataframe = dataframe.reindex(columns=self.columns_order)
-        
-        return dataframe
+        # rename() builds a new frame, the raw one is shared through the query cache
+        dataframe = self.projection.rename(dataframe, "deposits")
+
+        return decode(dataframe, self.projection.scalars)
 
 class WithdawTransactions:
-    def __init__(self, subgraph, subground, initial_timestamp=None):
+    columns_order = [
+        'Date', 'blockNumber', 'from', 'outputToken', 'outputTokenAmount',
+        'outputTokenAmountUSD'
+    ]
+    projection = Projection(
+        "Withdraw", columns_order, DEX_AMM_SCHEMA_PATH,
+        aliases={"Date": "timestamp", "outputTokenAmountUSD": "amountUSD"},
+    )
+
+    def __init__(self, subgraph, subground, initial_timestamp=None, dataframe=None):
         self.subgraph = subgraph
         self.subground = subground
         self.timestamp = initial_timestamp
-        self.columns_order = [
-            'Date', 'blockNumber', 'from', 'outputToken', 'outputTokenAmount',
-            'outputTokenAmountUSD'
-        ]
-        self.dataframe = self.query()
+        self.dataframe = self.query() if dataframe is None else self.format(dataframe)
 
-    def query(self):
-        swaps = self.subgraph.Query.withdraws(
+    @classmethod
+    def section(cls, subgraph):
+        withdraws = subgraph.Query.withdraws(
             first=15,
-            orderBy=self.subgraph.Withdraw.timestamp,
+            orderBy=subgraph.Withdraw.timestamp,
             orderDirection="desc",
         )
 
-        dataframe = self.subground.query_df([swaps])
+        key = QUERY_CACHE.make_key(
+            subgraph._url, "withdraws", orderBy="timestamp", orderDirection="desc", first=15
+        )
+
+        return Section(key=key, fieldpaths=cls.projection.select(withdraws))
 
+    def query(self):
+        section = self.section(self.subgraph)
+
+        dataframe = QUERY_CACHE.get_or_fetch(
+            section.key, lambda: self.subground.query_df(section.fieldpaths)
+        )
+
+        return self.format(dataframe)
+
+    def format(self, dataframe):
         if dataframe.empty:
             return dataframe
-        
-        dataframe.columns = [
-            'id', 'hash', 'logIndex', 'protocol_id', 'to', 'from', 'blockNumber', 
-            'Date', 'outputToken', 'outputTokenAmount', 'outputTokenAmountUSD', 'pool_id'
-        ]
-
-        dataframe.drop(
-            ["id", "to", "logIndex", "protocol_id", "pool_id"], axis=1, inplace=True
-        )
-        dataframe['hash'] = dataframe['hash'].map(str)
-        dataframe['blockNumber'] = dataframe['blockNumber'].map(int)
-        dataframe['Date'] = pd.to_datetime(dataframe['Date'].map(int), unit='s')
-        dataframe['outputToken'] = dataframe['outputToken'].map(str)
-        dataframe['outputTokenAmount'] = dataframe['outputTokenAmount'].map(float)
-        dataframe['outputTokenAmountUSD'] = dataframe['outputTokenAmountUSD'].map(str)
-
-        dataframe = dataframe.reindex(columns=self.columns_order)
-        
-        return dataframe
+
+        # rename() builds a new frame, the raw one is shared through the query cache
+        dataframe = self.projection.rename(dataframe, "withdraws")
+
+        return decode(dataframe, self.projection.scalars)
@@ -1,12 +1,80 @@
-import pytz
-import datetime
+import calendar
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
 from pyecharts.types import JsCode
 
+# Charts of a page share the same id series, so their labels are formatted once
+XAXIS_LABELS_CACHE_SIZE = 64
+_xaxis_labels = OrderedDict()
+_xaxis_labels_lock = threading.Lock()
+
+# strftime directives of a date, as fields of a str.format template
+DATE_DIRECTIVES = {"%Y": "{0}", "%m": "{1:02d}", "%d": "{2:02d}", "%B": "{3}", "%b": "{4}", "%%": "%"}
+
+
+def series_fingerprint(series) -> str:
+    values = pd.util.hash_pandas_object(pd.Series(series), index=False).to_numpy()
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+
+def dataframe_fingerprint(dataframe) -> str:
+    values = pd.util.hash_pandas_object(dataframe, index=True).to_numpy()
+    digest = hashlib.blake2b(values.tobytes(), digest_size=16)
+    digest.update("|".join(map(str, dataframe.columns)).encode())
+    return digest.hexdigest()
+
 
 def format_xaxis(series: list[int], Multiplier=60 * 60 * 24, format: str = "%B %d, %Y"):
+    key = (series_fingerprint(series), Multiplier, format)
+
+    with _xaxis_labels_lock:
+        labels = _xaxis_labels.get(key)
+        if labels is not None:
+            _xaxis_labels.move_to_end(key)
+            return labels
+
+    timestamps = pd.to_numeric(pd.Series(series)).astype("int64").to_numpy() * Multiplier
+    labels = format_timestamps(timestamps, format)
+
+    with _xaxis_labels_lock:
+        _xaxis_labels[key] = labels
+        while len(_xaxis_labels) > XAXIS_LABELS_CACHE_SIZE:
+            _xaxis_labels.popitem(last=False)
+
+    return labels
+
+def format_timestamps(timestamps, format):
+    """
+    `format` of the Unix `timestamps`, in UTC.
+
+    strftime formats one label at a time, so date formats are filled from the
+    year, month and day of datetime64 day arithmetic instead. Other formats
+    are formatted once per unique timestamp.
+    """
+    directives = re.findall(r"%.", format)
+    if not all(directive in DATE_DIRECTIVES for directive in directives):
+        unique, inverse = np.unique(timestamps, return_inverse=True)
+        labels = [datetime.fromtimestamp(timestamp, timezone.utc).strftime(format) for timestamp in unique.tolist()]
+        return [labels[i] for i in inverse.tolist()]
+
+    template = re.sub(r"%.", lambda match: DATE_DIRECTIVES[match.group()], format.replace("{", "{{").replace("}", "}}"))
+    days = (timestamps // (60 * 60 * 24)).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    # Years and months since 1970
+    years = months.astype("datetime64[Y]").astype("int64")
+    month_of_year = months.astype("int64") - years * 12 + 1
+    day_of_month = (days - months).astype("int64") + 1
+    # calendar formats a name on every lookup
+    month_names, month_abbrs = list(calendar.month_name), list(calendar.month_abbr)
     return [
-        datetime.datetime.fromtimestamp(i).astimezone(pytz.utc).strftime(format)
-        for i in list(map(lambda x: int(x) * Multiplier, series))
+        template.format(year, month, day, month_names[month], month_abbrs[month])
+        for year, month, day in zip((years + 1970).tolist(), month_of_year.tolist(), day_of_month.tolist())
     ]
 
 def xaxis_label_formatter():
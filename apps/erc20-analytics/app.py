@@ -1,15 +1,28 @@
+import os
+import sys
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 import altair as alt
 import pandas as pd
 from subgrounds.subgrounds import Subgrounds
+from common.introspection import SCHEMAS
+from common.tracing import render_trace_panel, section, start_trace, traced
 
 # Refresh every 30 seconds
 REFRESH_INTERVAL_SEC = 30
 
+TRACE = start_trace("erc20-analytics")
 sg = Subgrounds()
-erc20Subgraph = sg.load_subgraph("https://api.thegraph.com/subgraphs/name/corerouter/erc20")
+with section("load_subgraph"):
+    erc20Subgraph = SCHEMAS.load_subgraph(sg, "https://api.thegraph.com/subgraphs/name/corerouter/erc20")
 
+@traced()
 def fetch_tokens(subgraph):
     tokens = subgraph.Query.tokens(
         orderBy='id', 
@@ -38,6 +51,7 @@ def fetch_tokens(subgraph):
 
     return df[["symbol", "totalSupply", "holderCount", "transferCount", "address"]]
 
+@traced()
 def fetch_account_token(subgraph, tokenAddress):
     accountBalances = subgraph.Query.accountBalances(
         orderBy='amount', 
@@ -79,13 +93,16 @@ def fetch_account_token(subgraph, tokenAddress):
     )
     account_df["amount"] = account_df["amount"].map("{:,.2f}".format)
 
+    return account_df,format_token_snapshots(token_df)
+
+def format_token_snapshots(token_df):
     token_df = token_df.rename(
         columns=lambda x: x[len("tokenDailySnapshots_") :]
     )
-    token_df["Date"] = pd.to_datetime(token_df["id"].str.split("-").apply(lambda x: x[1]), unit="d").dt.date
+    # Snapshot ids are <token address>-<day number>
+    token_df["Date"] = pd.to_datetime(token_df["id"].str.split("-").str[1].astype("int64"), unit="D").dt.date
     token_df = token_df.drop(columns="id")
-
-    return account_df,token_df
+    return token_df
 
 
 st.set_page_config(layout="wide")
@@ -116,23 +133,27 @@ else:
     st.header("Top Account")
     st.markdown(account_df.to_markdown())
 
-    st.header("Token Daily Snapshot")
-    token_snapshot_dailyTransferCount_line_chart = (
-        alt.Chart(token_df)
-        .mark_line()
-        .encode(
-            x="Date:T",
-            y="dailyTransferCount:Q"
+    with section("charts"):
+        st.header("Token Daily Snapshot")
+        token_snapshot_dailyTransferCount_line_chart = (
+            alt.Chart(token_df)
+            .mark_line()
+            .encode(
+                x="Date:T",
+                y="dailyTransferCount:Q"
+            )
         )
-    )
-    st.altair_chart(token_snapshot_dailyTransferCount_line_chart, use_container_width=True)
-
-    token_snapshot_dailyTransferAmount_line_chart = (
-        alt.Chart(token_df)
-        .mark_line()
-        .encode(
-            x="Date:T",
-            y="dailyTransferAmount:Q"
+        st.altair_chart(token_snapshot_dailyTransferCount_line_chart, use_container_width=True)
+
+        token_snapshot_dailyTransferAmount_line_chart = (
+            alt.Chart(token_df)
+            .mark_line()
+            .encode(
+                x="Date:T",
+                y="dailyTransferAmount:Q"
+            )
         )
-    )
-    st.altair_chart(token_snapshot_dailyTransferAmount_line_chart, use_container_width=True)
+        st.altair_chart(token_snapshot_dailyTransferAmount_line_chart, use_container_width=True)
+
+render_trace_panel(TRACE)
+TRACE.finish()
@@ -1,18 +1,55 @@
+import os
+import sys
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.decode import decode
+from common.downsample import downsample_frame
+from common.incremental import SNAPSHOTS
+from common.introspection import SCHEMAS
+from common.schema import LENDING_SCHEMA_PATH, scalars_of
+from common.tracing import render_trace_panel, section, start_trace
 from utilities.coingecko import get_coin_market_cap, get_market_data
+from utilities.timeseries import asof_join
+from utilities.events import get_event_feed
+from utilities.loader import PageLoader, fragment
 from subgrounds.subgrounds import Subgrounds
 from streamlit_autorefresh import st_autorefresh
-from datetime import datetime
 import streamlit as st
 import altair as alt
 import pandas as pd
 
-# Refresh every 30 seconds
-REFRESH_INTERVAL_SEC = 30
+# Staleness budget of each dataset. Every section of the page reruns on its
+# own at the shortest budget of the data it shows, reloading only what expired.
+MAX_AGE_SEC = {
+    'events': 30,
+    'market_data': 60,
+    'financials': 10 * 60,
+    'usage': 10 * 60,
+    'markets': 10 * 60,
+    'market_caps': 60 * 60,
+}
+
+# Points per line sent to the browser, longer histories are downsampled with
+# LTTB. None sends every point.
+CHART_MAX_POINTS = 1000
+
+# Days of daily snapshots kept on the page, None for the full history
+HISTORY_DAYS = None
+# Snapshots requested for the full history, Subgrounds paginates up to it
+MAX_SNAPSHOTS = 100000
+# Trailing days the annualized KPIs average over, whatever HISTORY_DAYS is
+KPI_WINDOW_DAYS = 100
 
 # Initialize Subgrounds
 SUBGRAPH_URL = "https://api.thegraph.com/subgraphs/name/messari/makerdao-ethereum" # messari/makerdao-ethereum
+TRACE = start_trace("makerdao-analytics")
 sg = Subgrounds()
-makerdao = sg.load_subgraph(SUBGRAPH_URL)
+with section("load_subgraph"):
+    makerdao = SCHEMAS.load_subgraph(sg, SUBGRAPH_URL)
 #  python3.10 -m streamlit run protocols/makerdao.py 
 
 x= ["0xF72beaCc6fD334E14a7DDAC25c3ce1Eb8a827E10",
@@ -31,23 +68,23 @@ x = [a.lower() for a in x]
 #####################
 
 st.set_page_config(layout="wide")
-ticker = st_autorefresh(interval=REFRESH_INTERVAL_SEC * 1000, key="ticker")
 st.title("MakerDao Analytics")
 
-data_loading = st.text(f"[Every {REFRESH_INTERVAL_SEC} seconds] Loading data...")
+data_loading = st.text("Loading data...")
 
 
 def format_currency(x):
     return "${:.1f}K".format(x/1000)
 
 
-def get_financial_snapshots(subgraph):
+def query_financial_snapshots(subgraph, timestamp):
     financialSnapshot = subgraph.Query.financialsDailySnapshots(
+    where=[subgraph.FinancialsDailySnapshot.timestamp > timestamp],
     orderBy=subgraph.FinancialsDailySnapshot.timestamp,
     orderDirection='desc',
-    first=100
+    first=HISTORY_DAYS or MAX_SNAPSHOTS
     )
-    df = sg.query_df([
+    fieldpaths = [
     financialSnapshot.id,
     financialSnapshot.totalValueLockedUSD,
     financialSnapshot.dailyProtocolSideRevenueUSD,
@@ -62,11 +99,31 @@ def get_financial_snapshots(subgraph):
     financialSnapshot.cumulativeLiquidateUSD,
     financialSnapshot.mintedTokenSupplies,
     financialSnapshot.timestamp,
-    ])
-    df['Date'] = df['financialsDailySnapshots_id'].apply(lambda x: datetime.utcfromtimestamp(int(x)*86400))
+    ]
+    return decode(sg.query_df(fieldpaths), scalars_of('FinancialsDailySnapshot', fieldpaths, LENDING_SCHEMA_PATH))
+
+
+def get_financial_snapshots(subgraph):
+    # Closed days are kept from the previous refresh, only the open day and newer ones are fetched
+    df = SNAPSHOTS.refresh(
+        (subgraph._url, 'financialsDailySnapshots'),
+        lambda timestamp: query_financial_snapshots(subgraph, timestamp),
+        id_column='financialsDailySnapshots_id',
+        ascending=False,
+        window=HISTORY_DAYS
+    ).copy()
+    df = format_financial_snapshots(df)
+    print(df)
+    return df
+
+
+def format_financial_snapshots(df):
+    # Snapshot ids are day numbers
+    df['Date'] = pd.to_datetime(df['financialsDailySnapshots_id'].astype('int64'), unit='D')
     df['Collateralization Ratio'] = df['financialsDailySnapshots_totalBorrowBalanceUSD'] / df['financialsDailySnapshots_totalDepositBalanceUSD']
-    df['financialsDailySnapshots_mintedTokenSupplies'] = df['financialsDailySnapshots_mintedTokenSupplies'].apply(lambda x: float(x)/1e18)
-    df['Dai Supply'] = [row['financialsDailySnapshots_mintedTokenSupplies'] for i,row in df.iterrows()]
+    # Supplies overflow int64, converted to float before scaling down from wei
+    df['financialsDailySnapshots_mintedTokenSupplies'] = df['financialsDailySnapshots_mintedTokenSupplies'].astype('float64') / 1e18
+    df['Dai Supply'] = df['financialsDailySnapshots_mintedTokenSupplies']
     df = df.rename(columns={
         'financialsDailySnapshots_cumulativeBorrowUSD':'Loan Origination',
         'financialsDailySnapshots_cumulativeLiquidateUSD':'Cumulative Liquidations',
@@ -80,17 +137,17 @@ def get_financial_snapshots(subgraph):
         'financialsDailySnapshots_totalDepositBalanceUSD':'Total Deposit Balance',
         'financialsDailySnapshots_totalBorrowBalanceUSD':'Total Borrow Balance'
         })
-    print(df)
     return df
 
 
-def get_usage_metrics_df(subgraph):
+def query_usage_metrics(subgraph, timestamp):
     usageMetrics = subgraph.Query.usageMetricsDailySnapshots(
+    where=[subgraph.UsageMetricsDailySnapshot.timestamp > timestamp],
     orderBy=subgraph.UsageMetricsDailySnapshot.timestamp,
     orderDirection='desc',
-    first=100
+    first=HISTORY_DAYS or MAX_SNAPSHOTS
     )
-    df = sg.query_df([
+    fieldpaths = [
     usageMetrics.id,
     usageMetrics.dailyDepositCount,
     usageMetrics.dailyWithdrawCount,
@@ -99,8 +156,19 @@ def get_usage_metrics_df(subgraph):
     usageMetrics.dailyLiquidateCount,
     usageMetrics.dailyActiveUsers,
     usageMetrics.cumulativeUniqueUsers,
-    ])
-    df['Date'] = df['usageMetricsDailySnapshots_id'].apply(lambda x: datetime.utcfromtimestamp(int(x)*86400))
+    ]
+    return decode(sg.query_df(fieldpaths), scalars_of('UsageMetricsDailySnapshot', fieldpaths, LENDING_SCHEMA_PATH))
+
+
+def get_usage_metrics_df(subgraph):
+    df = SNAPSHOTS.refresh(
+        (subgraph._url, 'usageMetricsDailySnapshots'),
+        lambda timestamp: query_usage_metrics(subgraph, timestamp),
+        id_column='usageMetricsDailySnapshots_id',
+        ascending=False,
+        window=HISTORY_DAYS
+    ).copy()
+    df['Date'] = pd.to_datetime(df['usageMetricsDailySnapshots_id'].astype('int64'), unit='D')
     df = df.rename(columns={
         'usageMetricsDailySnapshots_dailyDepositCount':'Daily Deposit Count',
         'usageMetricsDailySnapshots_dailyWithdrawCount':'Daily Withdraw Count',
@@ -126,43 +194,25 @@ def get_markets_df(subgraph):
     ])
     return markets_df
 
-def get_events_df(subgraph,event_name='Deposit'):
-    slug = event_name.lower()+'s'
-    event = subgraph.Query.__getattribute__(slug)(
-        orderBy=subgraph.__getattribute__(event_name).timestamp,
-        orderDirection='desc',
-        first=10
-    )
-    df = sg.query_df([
-        event.timestamp,
-        event.hash,
-        event.__getattribute__('from'),
-        event.to,
-        event.market.name,
-        event.asset.symbol,
-        event.amountUSD
-    ])
-    df = df.rename(columns={
-        slug+'_timestamp':'Date',
-        slug+'_hash':'Transaction Hash',
-        slug+'_from':'From',
-        slug+'_to':'To',
-        slug+'_market_name':'Market',
-        slug+'_asset_symbol':'Asset',
-        slug+'_amountUSD':'Amount'
-    })
-    df['Date'] = df['Date'].apply(lambda x: datetime.utcfromtimestamp(int(x)))
-    df['Amount'] = df['Amount'].apply(lambda x: "${:.1f}k".format((x/1000)))
+def get_events_df(subgraph):
+    # Every event type in one request, a full activity feed costs one round trip
+    return get_event_feed(sg, subgraph, first=10)
+
+
+def format_amounts(df):
+    df = df.copy()
+    df['Amount'] = (df['Amount'] / 1000).map("${:.1f}k".format)
     return df
 
 
-def get_revenue_df(df):
-    mcap_df = get_coin_market_cap('maker')
-    revenue_df = df.merge(mcap_df, how='inner', on='Date')
+def get_revenue_df(df, mcap_df):
+    # Each day gets the last market cap at or before its start, sorted as-of
+    # join rather than an exact match on timestamps
+    revenue_df = asof_join(df, mcap_df, on='Date', tolerance=pd.Timedelta(days=1))
     revenue_df = revenue_df[(revenue_df['Daily Protocol Revenue']>0) | (revenue_df['Daily Total Revenue']>0)]
     revenue_df['P/E Ratio'] = (revenue_df['mcap'] / revenue_df['Daily Protocol Revenue'])/1000
     revenue_df['P/S Ratio'] = (revenue_df['mcap'] / revenue_df['Daily Total Revenue'])/1000
-    revenue_df = revenue_df.sort_values(by='Date')[:-1]
+    revenue_df = revenue_df.iloc[:-1]
     return revenue_df
 
 
@@ -174,9 +224,9 @@ def get_top_10_markets_tvl(markets_df):
 
 def get_asset_tvl(markets_df):
     assets_df = markets_df.copy()
-    for i, row in assets_df.iterrows():
-        if row['markets_inputToken_name'] == 'Uniswap V2':
-            assets_df.loc[i, 'markets_inputToken_symbol'] = row['markets_name'].split('-')[0]
+    # Uniswap V2 LP tokens are named after their market
+    uniswap = assets_df['markets_inputToken_name'] == 'Uniswap V2'
+    assets_df.loc[uniswap, 'markets_inputToken_symbol'] = assets_df.loc[uniswap, 'markets_name'].str.split('-').str[0]
     assets_df = assets_df.groupby(['markets_inputToken_id', 'markets_inputToken_symbol'])['markets_totalValueLockedUSD'].sum().reset_index()
     assets_df = assets_df[assets_df['markets_totalValueLockedUSD'] >= 1.0]
     assets_df = assets_df.rename(columns={'markets_totalValueLockedUSD': 'Total Value Locked', 'markets_inputToken_symbol': 'Token'})
@@ -195,16 +245,6 @@ def get_stable_ratio(assets_df):
     return stable_ratio_df
 
 
-df = get_financial_snapshots(makerdao)
-usage_df = get_usage_metrics_df(makerdao)
-markets_df = get_markets_df(makerdao)
-revenue_df = get_revenue_df(df)
-
-top_10 = get_top_10_markets_tvl(markets_df)
-assets_df = get_asset_tvl(markets_df)
-
-data_loading.text(f"[Every {REFRESH_INTERVAL_SEC} seconds] Loading data... done!")
-
 scales = alt.selection_interval(bind='scales')
 # Create a selection that chooses the nearest point & selects based on x-value
 
@@ -215,6 +255,9 @@ nearest = alt.selection(type='single', nearest=True, on='mouseover',
 
 def build_financial_chart(df, column, title=None, y_axis_format='$,.2f',color=None):
     title = column if not title else title
+    # Altair embeds the whole dataframe in the chart spec, only ship what is drawn
+    df = df[['Date', column] + ([color] if color else [])]
+    df = downsample_frame(df, 'Date', column, CHART_MAX_POINTS, by=color)
     y_axis = alt.Y(column+":Q", axis=alt.Axis(format=y_axis_format)) if y_axis_format else alt.Y(column+":Q")
     line = alt.Chart(df).mark_line().encode(x=date_axis, y=y_axis, tooltip=[alt.Tooltip("Date")])
     if color:
@@ -259,10 +302,6 @@ def build_multi_line_rev_chart(revenue_df):
     chart = build_financial_chart(formatted_df,  'Revenue', 'Daily Revenue', color='Side')
     return chart
 
-st.header('Protocol Snapshot')
-col1, col2, col3, col4, col5, col6 = st.columns(6)
-
-market_data = get_market_data('maker')
 
 def has_percent(val):
     return True if '%' in val else False
@@ -285,130 +324,182 @@ def annualize_value(val_list):
     return annual_val
 
 
-with col1:
-    st.subheader(market_data["price"])
-    st.markdown('24h: {}'.format(get_colored_text(market_data['24hr_change'])) + '$~~~~~$ 7d: {}'.format(get_colored_text(market_data['7d_change'])), unsafe_allow_html=True)
-    st.markdown('30d: {}'.format(get_colored_text(market_data['30d_change'])) + '$~~~~$ 1y: {}'.format(get_colored_text(market_data['1y_change'])), unsafe_allow_html=True)
-
-with col2:
-    st.header('')
-    text = '<span style="color:gray;">Circulating market cap:</span><br><span style="color:black;">{}</span>'.format(market_data['circ_market_cap'])
-    st.markdown(text, unsafe_allow_html=True)
-    text = '<span style="color:gray;">Fully-diluted market cap:</span><br><span style="color:black;">{}</span>'.format(market_data['fdv_market_cap'])
-    st.markdown(text, unsafe_allow_html=True)
-
-
-with col3:
-    st.header('')
-    rate_change_rev = (sum(df['Daily Total Revenue'][:30])-sum(df['Daily Total Revenue'][31:60]))/sum(df['Daily Total Revenue'][:30])
-    text = '<span style="color:gray;">Total revenue 30d:</span><br>' \
-           '<span style="color:black;">{}</span>' \
-           '<span style="color:{};"> ({})</span>'.format("${:,.2f}".format(sum(df['Daily Total Revenue'][:30])),which_color(rate_change_rev), '{:.2%}'.format(rate_change_rev))
-    st.markdown(text, unsafe_allow_html=True)
-    rate_change_rev = (sum(df['Daily Protocol Revenue'][:30])-sum(df['Daily Protocol Revenue'][31:60]))/sum(df['Daily Protocol Revenue'][:30])
-    text = '<span style="color:gray;">Total protocol revenue 30d:</span><br>' \
-           '<span style="color:black;">{}</span>' \
-           '<span style="color:{};"> ({})</span>'.format("${:,.2f}".format(sum(df['Daily Protocol Revenue'][:30])),which_color(rate_change_rev), '{:.2%}'.format(rate_change_rev))
-    st.markdown(text, unsafe_allow_html=True)
-
-with col4:
-    st.header('')
-    text = '<span style="color:gray;">Annualized total revenue:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(df['Daily Total Revenue'])))
-    st.markdown(text, unsafe_allow_html=True)
-    text = '<span style="color:gray;">Annualized protocol revenue:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(df['Daily Protocol Revenue'])))
-    st.markdown(text, unsafe_allow_html=True)
-
-with col5:
-    st.header('')
-    text = '<span style="color:gray;">P/S Ratio:</span><br><span style="color:black;">{}</span>'.format("{:,.2f}".format(revenue_df.iloc[-1]['P/S Ratio']))
-    st.markdown(text, unsafe_allow_html=True)
-    text = '<span style="color:gray;">P/E Ratio:</span><br><span style="color:black;">{}</span>'.format("{:,.2f}".format(revenue_df.iloc[-1]['P/E Ratio']))
-    st.markdown(text, unsafe_allow_html=True)
-
-with col6:
-    st.header('')
-    text = '<span style="color:gray;">Annualized borrowing volume:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(df['Daily Borrows USD'])))
-    st.markdown(text, unsafe_allow_html=True)
-    text = '<span style="color:gray;">Total value locked:</span><br><span style="color:black;">{}</span>'.format(market_data['tvl'])
-    st.markdown(text, unsafe_allow_html=True)
-
-st.header('Key Metrics')
-
-with st.container():
-    tvl = build_financial_chart(df, 'Total Value Locked')
-    rev = build_financial_chart(df, 'Daily Total Revenue')
-    dai_supply = build_financial_chart(df, 'Dai Supply')
-
-    st.altair_chart(tvl | rev | dai_supply, use_container_width=False)
-
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.subheader("Top 10 Markets by TVL")
-    top_10_markets = build_pie_chart(top_10, "Total Value Locked", "Market")
-    st.altair_chart(top_10_markets, use_container_width=False)
-
-with col2:
-    st.subheader("TVL by Asset")
-    tvl_per_asset = build_tvl_per_asset_pie(assets_df)
-    st.altair_chart(tvl_per_asset, use_container_width=False)
-
-with col3:
-    st.subheader("DAI Collateral Split")
-    stable_ratio_df = get_stable_ratio(assets_df)
-    stable_ratio_pie = alt.Chart(stable_ratio_df).mark_arc(innerRadius=50).encode(
-        theta=alt.Theta(field="ratio", type="quantitative"),
-        color=alt.Color(field="Collateral Type", type="nominal"),
-        tooltip=[alt.Tooltip("ratio")],
-    )
-    st.altair_chart(stable_ratio_pie, use_container_width=False)
+def render_protocol_snapshot(market_data, df, revenue_df):
+    st.header('Protocol Snapshot')
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
+
+    with col1:
+        st.subheader(market_data["price"])
+        st.markdown('24h: {}'.format(get_colored_text(market_data['24hr_change'])) + '$~~~~~$ 7d: {}'.format(get_colored_text(market_data['7d_change'])), unsafe_allow_html=True)
+        st.markdown('30d: {}'.format(get_colored_text(market_data['30d_change'])) + '$~~~~$ 1y: {}'.format(get_colored_text(market_data['1y_change'])), unsafe_allow_html=True)
+
+    with col2:
+        st.header('')
+        text = '<span style="color:gray;">Circulating market cap:</span><br><span style="color:black;">{}</span>'.format(market_data['circ_market_cap'])
+        st.markdown(text, unsafe_allow_html=True)
+        text = '<span style="color:gray;">Fully-diluted market cap:</span><br><span style="color:black;">{}</span>'.format(market_data['fdv_market_cap'])
+        st.markdown(text, unsafe_allow_html=True)
+
+
+    with col3:
+        st.header('')
+        rate_change_rev = (sum(df['Daily Total Revenue'][:30])-sum(df['Daily Total Revenue'][31:60]))/sum(df['Daily Total Revenue'][:30])
+        text = '<span style="color:gray;">Total revenue 30d:</span><br>' \
+               '<span style="color:black;">{}</span>' \
+               '<span style="color:{};"> ({})</span>'.format("${:,.2f}".format(sum(df['Daily Total Revenue'][:30])),which_color(rate_change_rev), '{:.2%}'.format(rate_change_rev))
+        st.markdown(text, unsafe_allow_html=True)
+        rate_change_rev = (sum(df['Daily Protocol Revenue'][:30])-sum(df['Daily Protocol Revenue'][31:60]))/sum(df['Daily Protocol Revenue'][:30])
+        text = '<span style="color:gray;">Total protocol revenue 30d:</span><br>' \
+               '<span style="color:black;">{}</span>' \
+               '<span style="color:{};"> ({})</span>'.format("${:,.2f}".format(sum(df['Daily Protocol Revenue'][:30])),which_color(rate_change_rev), '{:.2%}'.format(rate_change_rev))
+        st.markdown(text, unsafe_allow_html=True)
+
+    # The charts show the full history, the run rates only its latest days
+    kpi_df = df.nlargest(KPI_WINDOW_DAYS, 'Date')
+
+    with col4:
+        st.header('')
+        text = '<span style="color:gray;">Annualized total revenue:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(kpi_df['Daily Total Revenue'])))
+        st.markdown(text, unsafe_allow_html=True)
+        text = '<span style="color:gray;">Annualized protocol revenue:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(kpi_df['Daily Protocol Revenue'])))
+        st.markdown(text, unsafe_allow_html=True)
+
+    with col5:
+        st.header('')
+        text = '<span style="color:gray;">P/S Ratio:</span><br><span style="color:black;">{}</span>'.format("{:,.2f}".format(revenue_df.iloc[-1]['P/S Ratio']))
+        st.markdown(text, unsafe_allow_html=True)
+        text = '<span style="color:gray;">P/E Ratio:</span><br><span style="color:black;">{}</span>'.format("{:,.2f}".format(revenue_df.iloc[-1]['P/E Ratio']))
+        st.markdown(text, unsafe_allow_html=True)
+
+    with col6:
+        st.header('')
+        text = '<span style="color:gray;">Annualized borrowing volume:</span><br><span style="color:black;">{}</span>'.format("${:,.2f}".format(annualize_value(kpi_df['Daily Borrows USD'])))
+        st.markdown(text, unsafe_allow_html=True)
+        text = '<span style="color:gray;">Total value locked:</span><br><span style="color:black;">{}</span>'.format(market_data['tvl'])
+        st.markdown(text, unsafe_allow_html=True)
+
+
+def render_key_metrics(df):
+    st.header('Key Metrics')
+
+    with st.container():
+        tvl = build_financial_chart(df, 'Total Value Locked')
+        rev = build_financial_chart(df, 'Daily Total Revenue')
+        dai_supply = build_financial_chart(df, 'Dai Supply')
+
+        st.altair_chart(tvl | rev | dai_supply, use_container_width=False)
+
+
+def render_markets(markets_df):
+    top_10 = get_top_10_markets_tvl(markets_df)
+    assets_df = get_asset_tvl(markets_df)
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.subheader("Top 10 Markets by TVL")
+        top_10_markets = build_pie_chart(top_10, "Total Value Locked", "Market")
+        st.altair_chart(top_10_markets, use_container_width=False)
+
+    with col2:
+        st.subheader("TVL by Asset")
+        tvl_per_asset = build_tvl_per_asset_pie(assets_df)
+        st.altair_chart(tvl_per_asset, use_container_width=False)
+
+    with col3:
+        st.subheader("DAI Collateral Split")
+        stable_ratio_df = get_stable_ratio(assets_df)
+        stable_ratio_pie = alt.Chart(stable_ratio_df).mark_arc(innerRadius=50).encode(
+            theta=alt.Theta(field="ratio", type="quantitative"),
+            color=alt.Color(field="Collateral Type", type="nominal"),
+            tooltip=[alt.Tooltip("ratio")],
+        )
+        st.altair_chart(stable_ratio_pie, use_container_width=False)
+
+
+def render_financial_statement(df):
+    st.header('Financial Statement')
+
+    statement_df = get_financial_statement_df(df)
+    st.table(data=statement_df[:10])
+
+
+def render_financial_metrics(revenue_df):
+    st.header('Financial Metrics')
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        protocol_rev = build_multi_line_rev_chart(revenue_df)
+        st.altair_chart(protocol_rev, use_container_width=False)
+
+    with col2:
+        ps_ratio = build_financial_chart(revenue_df, 'P/S Ratio', y_axis_format=None)
+        st.altair_chart(ps_ratio, use_container_width=False)
 
+    with col3:
+        pe_ratio = build_financial_chart(revenue_df, 'P/E Ratio', y_axis_format=None)
+        st.altair_chart(pe_ratio, use_container_width=False)
 
-st.header('Financial Statement')
+    col_ratio = build_financial_chart(revenue_df, 'Collateralization Ratio','Dai Collateralization Ratio', y_axis_format=None)
+    st.altair_chart(col_ratio, use_container_width=False)
 
-statement_df = get_financial_statement_df(df)
-st.table(data=statement_df[:10])
 
+def render_usage_metrics(usage_df):
+    st.header('Usage Metrics')
 
-st.header('Financial Metrics')
+    with st.container():
+        active = build_financial_chart(usage_df, 'Daily Active Users', y_axis_format=None)
+        new = build_financial_chart(usage_df, 'Cumulative New Users', y_axis_format=None)
 
-col1, col2, col3 = st.columns(3)
+        st.altair_chart(active | new, use_container_width=False)
 
-with col1:
-    protocol_rev = build_multi_line_rev_chart(revenue_df)
-    st.altair_chart(protocol_rev, use_container_width=False)
 
-with col2:
-    ps_ratio = build_financial_chart(revenue_df, 'P/S Ratio', y_axis_format=None)
-    st.altair_chart(ps_ratio, use_container_width=False)
+def render_live_transactions(events_df):
+    st.header('Live Transactions')
+    events_df = format_amounts(events_df)
 
-with col3:
-    pe_ratio = build_financial_chart(revenue_df, 'P/E Ratio', y_axis_format=None)
-    st.altair_chart(pe_ratio, use_container_width=False)
+    col1, col2 = st.columns(2)
 
-col_ratio = build_financial_chart(revenue_df, 'Collateralization Ratio','Dai Collateralization Ratio', y_axis_format=None)
-st.altair_chart(col_ratio, use_container_width=False)
+    with col1:
+        st.subheader('Deposits')
+        st.dataframe(data=events_df[events_df['eventType'] == 'Deposit'].drop(columns='eventType').reset_index(drop=True))
 
+    with col2:
+        st.subheader('Withdrawals')
+        st.dataframe(events_df[events_df['eventType'] == 'Withdraw'].drop(columns='eventType').reset_index(drop=True))
 
-st.header('Usage Metrics')
+    st.subheader('All Activity')
+    st.dataframe(events_df)
 
-with st.container():
-    active = build_financial_chart(usage_df, 'Daily Active Users', y_axis_format=None)
-    new = build_financial_chart(usage_df, 'Cumulative New Users', y_axis_format=None)
 
-    st.altair_chart(active | new, use_container_width=False)
+# Loaders are independent I/O so they run concurrently, each section is
+# rendered in place as soon as the data it needs has arrived
+loader = PageLoader(max_workers=6)
+loader.task('financials', lambda: get_financial_snapshots(makerdao), max_age_sec=MAX_AGE_SEC['financials'])
+loader.task('usage', lambda: get_usage_metrics_df(makerdao), max_age_sec=MAX_AGE_SEC['usage'])
+loader.task('markets', lambda: get_markets_df(makerdao), max_age_sec=MAX_AGE_SEC['markets'])
+loader.task('market_data', lambda: get_market_data('maker'), max_age_sec=MAX_AGE_SEC['market_data'])
+loader.task('market_caps', lambda: get_coin_market_cap('maker'), max_age_sec=MAX_AGE_SEC['market_caps'])
+loader.task('revenue', get_revenue_df, deps=['financials', 'market_caps'])
+loader.task('events', lambda: get_events_df(makerdao), max_age_sec=MAX_AGE_SEC['events'])
 
+loader.view(render_protocol_snapshot, deps=['market_data', 'financials', 'revenue'])
+loader.view(render_key_metrics, deps=['financials'])
+loader.view(render_markets, deps=['markets'])
+loader.view(render_financial_statement, deps=['financials'])
+loader.view(render_financial_metrics, deps=['revenue'])
+loader.view(render_usage_metrics, deps=['usage'])
+loader.view(render_live_transactions, deps=['events'])
 
-st.header('Live Transactions')
+loader.run()
 
-col1, col2 = st.columns(2)
+if fragment is None:
+    # Streamlit without fragments can only rerun the whole page, expired
+    # datasets are still the only ones reloaded
+    st_autorefresh(interval=loader.refresh_interval_sec() * 1000, key="ticker")
 
-with col1:
-    st.subheader('Deposits')
-    deposits_df = get_events_df(makerdao)
-    st.dataframe(data=deposits_df)
+data_loading.text("Loading data... done!")
 
-with col2:
-    st.subheader('Withdrawals')
-    withdrawals_df = get_events_df(makerdao, 'Withdraw')
-    st.dataframe(withdrawals_df)
\ No newline at end of file
+render_trace_panel(TRACE)
+TRACE.finish()
\ No newline at end of file
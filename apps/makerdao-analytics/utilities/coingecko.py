@@ -1,45 +1,271 @@
-from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from common.coalesce import Coalescer
 
 BASE_URL = "https://api.coingecko.com/api/v3/"
 
+# Shared by every app on the machine, like the subgraph schema cache
+CACHE_DIR = os.environ.get(
+    "COINGECKO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "coingecko"),
+)
+
+# CoinGecko serves the same response for this long anyway, asking again
+# sooner only spends rate limit
+LIVE_TTL_SEC = 60
+
+# Public API budget, shared by every session of the process
+CALLS_PER_MINUTE = int(os.environ.get("COINGECKO_CALLS_PER_MINUTE", 30))
+BURST = 5
+# Longest a page waits for a call slot before falling back to cached data
+MAX_WAIT_SEC = 10
+# Pause after a 429 that did not say how long to wait
+RATE_LIMITED_PAUSE_SEC = 60
+
+TIMEOUT = (5, 20)
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+CHART_SERIES = ("prices", "market_caps", "total_volumes")
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average and bursts of up to `capacity`.
+    `pause` empties the bucket until a given delay has passed, as CoinGecko
+    asks after answering 429.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """
+        Takes a token, waiting up to `timeout` seconds for one. False if none
+        became available in time.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.updated_at = self.paused_until
+            self.tokens = 0
+
+
+class CoinGeckoClient:
+    """
+    CoinGecko API client shared by every session of the process.
+
+    Requests go through one pooled keep-alive session, with retries on
+    connection errors and 5xx, and are spaced by a token bucket sized for the
+    public rate limit. Live responses (prices, market data) are kept for
+    LIVE_TTL_SEC. Concurrent requests for the same resource are coalesced:
+    the first caller sends it while the others wait for its result.
+
+    Market charts are kept on disk per coin. Only the newest daily point of a
+    chart can still change, so once a chart is stored a refresh asks for the
+    days since its last closed day only and merges them in. When CoinGecko
+    cannot be reached, or throttles, the last known data is served instead.
+    """
+
+    def __init__(self, base_url=BASE_URL, cache_dir=CACHE_DIR, live_ttl_sec=LIVE_TTL_SEC,
+                 calls_per_minute=CALLS_PER_MINUTE, burst=BURST):
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.live_ttl_sec = live_ttl_sec
+        self.limiter = TokenBucket(calls_per_minute / 60, burst)
+
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], allowed_methods=["GET"])
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=8, max_retries=retries))
+
+        # key -> (value, fetched_at)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._loads = Coalescer()
+
+    def get(self, path, **params):
+        """
+        JSON response of `path`, None if it could not be fetched.
+        """
+        if not self.limiter.acquire(MAX_WAIT_SEC):
+            print('Request Error: rate limited: {}'.format(path))
+            return None
+        try:
+            response = self.session.get(self.base_url + path, params=params, timeout=TIMEOUT)
+        except requests.RequestException as exn:
+            print('Request Error: {}'.format(exn))
+            return None
+
+        if response.status_code == 429:
+            self.limiter.pause(self._retry_after(response))
+        if response.status_code != 200:
+            print('Request Error: {}: {}'.format(response.status_code, path))
+            return None
+        return response.json()
+
+    def cached(self, key, fetch):
+        """
+        `fetch()` at most once per live TTL for `key`, concurrent callers
+        sharing a single call. A failed fetch (None) serves the last value.
+        """
+        def store():
+            value = fetch()
+            with self._lock:
+                if value is not None:
+                    self.entries[key] = (value, time.monotonic())
+                elif key in self.entries:
+                    value = self.entries[key][0]
+            return value
+
+        return self._loads.get(key, self._lookup, store)
+
+    def price(self, token_name):
+        return self.cached(
+            ("price", token_name),
+            lambda: self.get("simple/price", ids=token_name, vs_currencies="usd"),
+        )
+
+    def coin(self, token_name):
+        return self.cached(
+            ("coin", token_name),
+            lambda: self.get(f"coins/{token_name}", market_data="true", community_data="false", developer_data="false"),
+        )
+
+    def market_chart(self, token_name):
+        """
+        Daily market chart of `token_name` over its whole history, topped up
+        from the disk cache.
+        """
+        return self.cached(("market_chart", token_name), lambda: self._top_up_chart(token_name))
+
+    def _top_up_chart(self, token_name):
+        with self._lock:
+            entry = self.entries.get(("market_chart", token_name))
+        stored = entry[0] if entry else self.read(token_name)
+
+        closed = [point[0] for point in (stored or {}).get("market_caps", []) if point[0] % MS_PER_DAY == 0]
+        if closed:
+            # Re-fetch from the last closed day, it is where the newest points start
+            days = int(time.time() * 1000) // MS_PER_DAY - closed[-1] // MS_PER_DAY + 1
+        else:
+            days = "max"
+
+        fresh = self.get(f"coins/{token_name}/market_chart", vs_currency="usd", days=days, interval="daily")
+        if fresh is None:
+            return stored
+        if not closed:
+            chart = fresh
+        else:
+            chart = {series: self._merge(stored.get(series, []), fresh.get(series, [])) for series in CHART_SERIES}
+
+        self.write(token_name, chart)
+        return chart
+
+    @staticmethod
+    def _merge(stored, fresh):
+        if not fresh:
+            return stored
+        return [point for point in stored if point[0] < fresh[0][0]] + fresh
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.live_ttl_sec:
+            return True, entry[0]
+        return False, None
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return RATE_LIMITED_PAUSE_SEC
+
+    def path(self, token_name):
+        digest = hashlib.sha1(f"{self.base_url}{token_name}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"market_chart-{digest}.json")
+
+    def read(self, token_name):
+        try:
+            with open(self.path(token_name)) as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if stored.get("token") != token_name or stored.get("base_url") != self.base_url:
+            return None
+        return stored["chart"]
+
+    def write(self, token_name, chart):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path(token_name)
+            # Written aside then renamed, so other apps never read half a file
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(partial, "w") as cache_file:
+                json.dump({"token": token_name, "base_url": self.base_url, "chart": chart}, cache_file)
+            os.replace(partial, path)
+        except OSError:
+            # A read-only disk only costs the full download on the next start
+            pass
+
+
+COINGECKO = CoinGeckoClient()
+
+
 def get_coin_market_chart(token_name):
-    url = BASE_URL+"coins/{}/market_chart?vs_currency=usd&days=max&interval=daily".format(token_name)
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        result = resp.json()
-    else:
-        print('Request Error: {}: invalid token name'.format(resp.status_code))
-        result = {}
-    return result
+    return COINGECKO.market_chart(token_name) or {}
 
 def get_coin_market_cap(token_name):
     market_chart = get_coin_market_chart(token_name)
-    market_caps = [{
-        'Date':datetime.utcfromtimestamp(int(item[0]/1000)),
-        'mcap':item[1]
-        } for item in market_chart['market_caps']]
-    df = pd.DataFrame(market_caps)
+    market_caps = pd.DataFrame(market_chart.get('market_caps', []), columns=['timestamp', 'mcap'])
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(market_caps['timestamp'].astype('int64'), unit='ms'),
+        'mcap': market_caps['mcap'],
+    })
     return df
 
 def get_price(token_name):
-    url = 'https://api.coingecko.com/api/v3/simple/price?ids={}&vs_currencies=usd'.format(token_name)
-    resp = requests.get(url)
-    if resp.status_code == 200:
-        result = resp.json()
-        return result[token_name]['usd']
-    else:
-        print('Request Error: {}: invalid token name'.format(resp.status_code))
+    result = COINGECKO.price(token_name)
+    if result is None or token_name not in result:
         return 0
+    return result[token_name]['usd']
 
 def get_market_data(token_name):
-    url = 'https://api.coingecko.com/api/v3/coins/{}?market_data=true&community_data=false&developer_data=false'.format(token_name)
-    resp = requests.get(url)
+    result = COINGECKO.coin(token_name)
     result_dict = {}
-    if resp.status_code == 200:
-        result = resp.json()
+    if result is not None:
         result_dict['price'] = "${:,.2f}".format(result['market_data']['current_price']['usd'])
         result_dict['ath'] = "${:,.2f}".format(result['market_data']['ath']['usd'])
         result_dict['atl'] = "${:,.2f}".format(result['market_data']['atl']['usd'])
@@ -50,6 +276,4 @@ def get_market_data(token_name):
         result_dict['circ_market_cap'] = "${:,.2f}".format(result['market_data']['circulating_supply'] * result['market_data']['current_price']['usd'])
         result_dict['fdv_market_cap'] = "${:,.2f}".format(result['market_data']['fully_diluted_valuation']['usd'])
         result_dict['tvl'] = "${:,.2f}".format(result['market_data']['total_value_locked']['usd'])
-    else:
-        print('Request Error: {}: invalid token name'.format(resp.status_code))
-    return result_dict
\ No newline at end of file
+    return result_dict
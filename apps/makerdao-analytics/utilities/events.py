@@ -0,0 +1,71 @@
+import pandas as pd
+from subgrounds.dataframe_utils import df_of_json
+
+from common.decode import decode
+from common.schema import LENDING_SCHEMA_PATH, scalars_of
+
+# Event entities of the lending schema, in the order the feed categories use
+EVENT_TYPES = ("Deposit", "Withdraw", "Borrow", "Repay", "Liquidate")
+
+# Feed column of each selected field, named by its path below the event
+FEED_COLUMNS = {
+    "timestamp": "Date",
+    "hash": "Transaction Hash",
+    "from": "From",
+    "to": "To",
+    "market_name": "Market",
+    "asset_symbol": "Asset",
+    "amountUSD": "Amount",
+}
+
+
+def event_fieldpaths(subgraph, event_type, first):
+    """
+    Field paths of the `first` latest events of `event_type`, in the order of
+    FEED_COLUMNS.
+    """
+    entity = getattr(subgraph, event_type)
+    events = getattr(subgraph.Query, event_type.lower() + "s")(
+        orderBy=entity.timestamp,
+        orderDirection="desc",
+        first=first,
+    )
+    return [
+        events.timestamp,
+        events.hash,
+        getattr(events, "from"),
+        events.to,
+        events.market.name,
+        events.asset.symbol,
+        events.amountUSD,
+    ]
+
+
+def get_event_feed(subground, subgraph, event_types=EVENT_TYPES, first=10):
+    """
+    Latest `first` events of every type in `event_types`, fetched in a single
+    request and returned as one decoded frame, newest first, with the
+    columns of FEED_COLUMNS and an `eventType` categorical.
+
+    Subgrounds aliases each top-level field, so the event lists share one
+    GraphQL document and the response is split back per type. Pagination is
+    off, since it would send one request per list: `first` is at most the
+    1000 entities The Graph returns per list.
+    """
+    fieldpaths = {event_type: event_fieldpaths(subgraph, event_type, first) for event_type in event_types}
+    json_data = subground.query_json(
+        [fpath for fpaths in fieldpaths.values() for fpath in fpaths],
+        auto_paginate=False,
+    )
+
+    frames = []
+    for event_type, fpaths in fieldpaths.items():
+        frame = decode(df_of_json(json_data, fpaths), scalars_of(event_type, fpaths, LENDING_SCHEMA_PATH))
+        prefix = event_type.lower() + "s_"
+        frame = frame.rename(columns=lambda column: FEED_COLUMNS.get(column[len(prefix):], column))
+        frame["eventType"] = event_type
+        frames.append(frame.reindex(columns=[*FEED_COLUMNS.values(), "eventType"]))
+
+    feed = pd.concat(frames, ignore_index=True)
+    feed["eventType"] = pd.Categorical(feed["eventType"], categories=list(event_types))
+    return feed.sort_values("Date", ascending=False, kind="stable").reset_index(drop=True)
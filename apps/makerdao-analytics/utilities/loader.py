@@ -0,0 +1,202 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+import threading
+import time
+import streamlit as st
+
+from common.coalesce import Coalescer
+from common.tracing import section
+
+# Reruns only a function of the script, on a timer. Named experimental_fragment
+# before Streamlit 1.37, missing before 1.33.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+class DatasetStore:
+    """
+    Results of the page's data loaders, kept for the whole process so
+    sessions and reruns share them.
+
+    A dataset with a staleness budget (`max_age_sec`) is reloaded once it is
+    older than the budget. A dataset without one is derived from its
+    dependencies and only recomputed when one of them was reloaded, which
+    is detected by identity of the dependency results. Concurrent loads of
+    the same dataset are coalesced.
+
+    Stored results are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self):
+        # name -> (value, loaded_at, args)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._loads = Coalescer()
+
+    def fresh(self, name, args, max_age_sec):
+        """
+        (True, value) if the stored result of `name` can be served for
+        `args`, (False, None) otherwise.
+        """
+        with self._lock:
+            entry = self.entries.get(name)
+
+        if entry is None:
+            return False, None
+
+        value, loaded_at, stored_args = entry
+        if len(args) != len(stored_args) or any(a is not b for a, b in zip(args, stored_args)):
+            return False, None
+        if max_age_sec is not None and time.monotonic() - loaded_at >= max_age_sec:
+            return False, None
+        return True, value
+
+    def get_or_load(self, name, args, max_age_sec, load):
+        def store():
+            value = load(*args)
+            with self._lock:
+                self.entries[name] = (value, time.monotonic(), tuple(args))
+            return value
+
+        return self._loads.get(name, lambda name: self.fresh(name, args, max_age_sec), store)
+
+
+DATASETS = DatasetStore()
+
+
+class PageLoader:
+    """
+    Runs the data loaders of a page concurrently and renders each section as
+    soon as the data it needs is available.
+
+    Tasks are I/O-bound loaders (subgraph or CoinGecko requests) executed on a
+    bounded thread pool. A task may depend on other tasks, whose results are
+    passed to it as positional arguments. Views are rendered on the script
+    thread, since Streamlit elements cannot be created from worker threads,
+    into a container reserved at registration time so the page layout keeps
+    its order whatever the completion order of the tasks.
+
+    Each task declares how stale its data may get (`max_age_sec`) and its
+    result is served from `store` until then, tasks without a budget being
+    recomputed only when a dependency was reloaded. Each view is rendered as
+    a Streamlit fragment rerun on its own at the shortest budget it depends
+    on, reloading only the expired datasets, so a page no longer needs to be
+    reloaded as a whole. Without fragment support, views are plain and the
+    page has to be rerun, every `refresh_interval_sec()`.
+
+    Every task and view is traced as a section named after it. Tasks run in a
+    copy of the script's context so their subgraph requests are traced too.
+    """
+
+    def __init__(self, max_workers=6, store=DATASETS):
+        self.max_workers = max_workers
+        self.store = store
+        self.tasks = {}
+        self.views = []
+        self.results = {}
+
+    def task(self, name, fn, deps=(), max_age_sec=None):
+        self.tasks[name] = (fn, tuple(deps), max_age_sec)
+
+    def view(self, render, deps=()):
+        self.views.append((render, tuple(deps), st.container()))
+
+    def run(self):
+        pending_tasks = dict(self.tasks)
+        pending_views = list(self.views)
+        running = {}
+
+        def submit_ready(executor):
+            # Fresh results unlock their dependents right away, go on until
+            # only loads are left to wait for
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, (fn, deps, max_age_sec) in list(pending_tasks.items()):
+                    if all(dep in self.results for dep in deps):
+                        del pending_tasks[name]
+                        args = [self.results[dep] for dep in deps]
+                        found, value = self.store.fresh(name, args, max_age_sec)
+                        if found:
+                            self.results[name] = value
+                            progressed = True
+                            continue
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, self.load, name, args)] = name
+
+        def render_ready():
+            for view in list(pending_views):
+                render, deps, container = view
+                if all(dep in self.results for dep in deps):
+                    pending_views.remove(view)
+                    with container:
+                        self.render_view(render, deps)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            submit_ready(executor)
+            render_ready()
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future)] = future.result()
+
+                submit_ready(executor)
+                render_ready()
+
+        if pending_tasks:
+            raise ValueError(f"Unresolved task dependencies: {sorted(pending_tasks)}")
+
+        return self.results
+
+    def load(self, name, args):
+        fn, _, max_age_sec = self.tasks[name]
+        return self.store.get_or_load(name, args, max_age_sec, lambda *args: self.traced_task(name, fn, *args))
+
+    def resolve(self, name):
+        """
+        Result of task `name` loaded on the calling thread, reloading it and
+        its dependencies only if expired.
+        """
+        _, deps, _ = self.tasks[name]
+        return self.load(name, [self.resolve(dep) for dep in deps])
+
+    def max_age_sec(self, name):
+        """
+        Staleness budget of `name`, the shortest of its dependencies for a
+        derived task.
+        """
+        _, deps, max_age_sec = self.tasks[name]
+        budgets = [budget for budget in [max_age_sec, *map(self.max_age_sec, deps)] if budget is not None]
+        return min(budgets) if budgets else None
+
+    def refresh_interval_sec(self):
+        budgets = [budget for budget in map(self.max_age_sec, self.tasks) if budget is not None]
+        return min(budgets) if budgets else None
+
+    def render_view(self, render, deps):
+        budgets = [budget for budget in map(self.max_age_sec, deps) if budget is not None]
+        if fragment is None or not budgets:
+            with section(f"view:{render.__name__}"):
+                render(*[self.results[dep] for dep in deps])
+            return
+
+        # The first render uses the results of this run, later reruns of the
+        # fragment load what expired in the meantime
+        initial = [[self.results[dep] for dep in deps]]
+
+        @fragment(run_every=min(budgets))
+        def live_view():
+            args = initial.pop() if initial else [self.resolve(dep) for dep in deps]
+            with section(f"view:{render.__name__}"):
+                render(*args)
+
+        live_view()
+
+    @staticmethod
+    def traced_task(name, fn, *args):
+        with section(name) as record:
+            result = fn(*args)
+            if hasattr(result, "columns"):
+                record["rows"] = len(result)
+            return result
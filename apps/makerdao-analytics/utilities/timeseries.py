@@ -0,0 +1,32 @@
+import pandas as pd
+
+
+def sort_by_time(df, on):
+    """
+    `df` ordered by its `on` column, as is when already ascending.
+    """
+    if df[on].is_monotonic_increasing:
+        return df
+    return df.sort_values(on, kind="stable")
+
+
+def asof_join(left, right, on="Date", tolerance=pd.Timedelta(days=1), direction="backward"):
+    """
+    Rows of `left` enriched with the columns of the `right` row nearest in
+    time, e.g. daily snapshots with CoinGecko market caps.
+
+    Unlike an exact merge on timestamps, rows whose times differ by a few
+    hours or a few milliseconds still line up. `direction` is "backward" for
+    the last `right` row at or before each `left` row, "forward" or "nearest"
+    otherwise. Rows with nothing within `tolerance` are dropped. Both sides
+    are sorted first if needed, after which the join is a single linear pass;
+    the result is ascending in time.
+    """
+    left = sort_by_time(left, on)
+    right = sort_by_time(right, on)
+    # Both sides must share the datetime resolution (day numbers convert to
+    # seconds, CoinGecko milliseconds to microseconds)
+    right = right.assign(**{on: right[on].astype(left[on].dtype)})
+
+    joined = pd.merge_asof(left, right, on=on, tolerance=tolerance, direction=direction)
+    return joined.dropna(subset=[column for column in right.columns if column != on], how="all")
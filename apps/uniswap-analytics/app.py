@@ -1,37 +1,51 @@
+import os
+import sys
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 import altair as alt
 import pandas as pd
 from subgrounds.subgrounds import Subgrounds
+from common.incremental import SNAPSHOTS
+from common.downsample import downsample_stacked
+from common.introspection import SCHEMAS
+from common.tracing import render_trace_panel, section, start_trace, traced
 
 # Refresh every 30 seconds
 REFRESH_INTERVAL_SEC = 30
 
+# Dates per chart sent to the browser, longer histories are downsampled with
+# LTTB. None sends every date.
+CHART_MAX_POINTS = 1000
+
+TRACE = start_trace("uniswap-analytics")
 sg = Subgrounds()
-subgraphs = {
-    "matic": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-polygon"
-    ),
-    "optimism": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-optimism"
-    ),
-    "arbitrum_one": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-arbitrum"
-    ),
-}
+with section("load_subgraphs"):
+    subgraphs = {
+        "matic": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-polygon"
+        ),
+        "optimism": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-optimism"
+        ),
+        "arbitrum_one": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-arbitrum"
+        ),
+    }
 
 
-def fetch_data(network, subgraph):
+def fetch_financial_metrics(subgraph, timestamp):
     financial_metrics = subgraph.Query.financialsDailySnapshots(
+        where=[subgraph.FinancialsDailySnapshot.timestamp > timestamp],
         orderBy=subgraph.FinancialsDailySnapshot.id,
         orderDirection="desc",
         first=100,
     )
-    usage_metrics = subgraph.Query.usageMetricsDailySnapshots(
-        orderBy=subgraph.UsageMetricsDailySnapshot.id,
-        orderDirection="desc",
-        first=100,
-    )
     financial_df = sg.query_df(
         [
             financial_metrics.id,
@@ -40,21 +54,54 @@ def fetch_data(network, subgraph):
             financial_metrics.cumulativeTotalRevenueUSD,
         ]
     )
+    return financial_df.rename(
+        columns=lambda x: x[len("financialsDailySnapshots_") :]
+    )
+
+
+def fetch_usage_metrics(subgraph, timestamp):
+    usage_metrics = subgraph.Query.usageMetricsDailySnapshots(
+        where=[subgraph.UsageMetricsDailySnapshot.timestamp > timestamp],
+        orderBy=subgraph.UsageMetricsDailySnapshot.id,
+        orderDirection="desc",
+        first=100,
+    )
     usage_df = sg.query_df(
         [
             usage_metrics.id,
             usage_metrics.dailyActiveUsers,
         ]
     )
-    financial_df = financial_df.rename(
-        columns=lambda x: x[len("financialsDailySnapshots_") :]
-    )
-    usage_df = usage_df.rename(
+    return usage_df.rename(
         columns=lambda x: x[len("usageMetricsDailySnapshots_") :]
     )
+
+
+@traced()
+def fetch_data(network, subgraph):
+    # Only the still-open day and newer ones are downloaded after the first run
+    financial_df = SNAPSHOTS.refresh(
+        (subgraph._url, "financialsDailySnapshots"),
+        lambda timestamp: fetch_financial_metrics(subgraph, timestamp),
+        id_column="id",
+        ascending=False,
+        window=100,
+    )
+    usage_df = SNAPSHOTS.refresh(
+        (subgraph._url, "usageMetricsDailySnapshots"),
+        lambda timestamp: fetch_usage_metrics(subgraph, timestamp),
+        id_column="id",
+        ascending=False,
+        window=100,
+    )
+    return format_snapshots(financial_df, usage_df, network)
+
+
+def format_snapshots(financial_df, usage_df, network):
     df = pd.merge(financial_df, usage_df)
     df["network"] = network
-    df["date"] = pd.to_datetime(df["id"], unit="d")
+    # Snapshot ids are day numbers
+    df["date"] = pd.to_datetime(df["id"].astype("int64"), unit="D")
     df = df.drop(columns="id")
     return df
 
@@ -71,42 +118,49 @@ df = pd.concat(
 data_loading.text(f"[Every {REFRESH_INTERVAL_SEC} seconds] Loading data... done!")
 
 # Plot charts with altair is like a breeze
-st.header("Revenue")
-rev_stacked_bar_chart = (
-    alt.Chart(df)
-    .mark_bar()
-    .encode(x="date:T", y="cumulativeTotalRevenueUSD:Q", color="network:N")
-)
-st.altair_chart(rev_stacked_bar_chart, use_container_width=True)
+with section("chart:revenue"):
+    st.header("Revenue")
+    rev_stacked_bar_chart = (
+        alt.Chart(downsample_stacked(df, "date", "cumulativeTotalRevenueUSD", CHART_MAX_POINTS, by="network"))
+        .mark_bar()
+        .encode(x="date:T", y="cumulativeTotalRevenueUSD:Q", color="network:N")
+    )
+    st.altair_chart(rev_stacked_bar_chart, use_container_width=True)
 
-st.header("TVL")
-tvl_stacked_bar_chart = (
-    alt.Chart(df)
-    .mark_bar()
-    .encode(x="date:T", y="totalValueLockedUSD:Q", color="network:N")
-)
-st.altair_chart(tvl_stacked_bar_chart, use_container_width=True)
-
-st.header("Volume")
-volume_norm_stacked_area_chart = (
-    alt.Chart(df)
-    .mark_area()
-    .encode(
-        x="date:T",
-        y=alt.Y("cumulativeVolumeUSD:Q", stack="normalize"),
-        color="network:N",
+with section("chart:tvl"):
+    st.header("TVL")
+    tvl_stacked_bar_chart = (
+        alt.Chart(downsample_stacked(df, "date", "totalValueLockedUSD", CHART_MAX_POINTS, by="network"))
+        .mark_bar()
+        .encode(x="date:T", y="totalValueLockedUSD:Q", color="network:N")
     )
-)
-st.altair_chart(volume_norm_stacked_area_chart, use_container_width=True)
-
-st.header("DAU")
-dau_line_chart = (
-    alt.Chart(df)
-    .mark_line()
-    .encode(
-        x="date:T",
-        y="dailyActiveUsers:Q",
-        color="network:N",
+    st.altair_chart(tvl_stacked_bar_chart, use_container_width=True)
+
+with section("chart:volume"):
+    st.header("Volume")
+    volume_norm_stacked_area_chart = (
+        alt.Chart(downsample_stacked(df, "date", "cumulativeVolumeUSD", CHART_MAX_POINTS, by="network"))
+        .mark_area()
+        .encode(
+            x="date:T",
+            y=alt.Y("cumulativeVolumeUSD:Q", stack="normalize"),
+            color="network:N",
+        )
     )
-)
-st.altair_chart(dau_line_chart, use_container_width=True)
+    st.altair_chart(volume_norm_stacked_area_chart, use_container_width=True)
+
+with section("chart:dau"):
+    st.header("DAU")
+    dau_line_chart = (
+        alt.Chart(downsample_stacked(df, "date", "dailyActiveUsers", CHART_MAX_POINTS, by="network"))
+        .mark_line()
+        .encode(
+            x="date:T",
+            y="dailyActiveUsers:Q",
+            color="network:N",
+        )
+    )
+    st.altair_chart(dau_line_chart, use_container_width=True)
+
+render_trace_panel(TRACE)
+TRACE.finish()
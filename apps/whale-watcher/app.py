@@ -1,12 +1,47 @@
+import os
+import sys
+import time
+
+# Modules shared by the apps live in apps/common
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 import pandas as pd
-from datetime import datetime
 from subgrounds.subgrounds import Subgrounds
+from common.decode import decode
+from common.introspection import SCHEMAS
+from common.schema import DEX_AMM_SCHEMA_PATH, scalars_of
+from common.tracing import render_trace_panel, section, start_trace, traced
+from feed import FEEDS, SwapFeed, merge_newest
+from poller import POLLERS
 
 # Refresh every 10 seconds
 REFRESH_INTERVAL_SEC = 10
 
+# Amounts the table can be filtered on. Swaps are fetched once at the lowest
+# one and higher ones are filtered locally, a network whose buffer holds fewer
+# than SWAP_ROWS swaps above the selected one is backfilled by a query at it.
+THRESHOLDS = [100, 1000, 10000, 100000]
+
+# Latest swaps kept per network, one Subgrounds page. After the first load
+# only swaps newer than the ones held are fetched.
+SWAP_BUFFER_SIZE = 900
+
+# Swaps shown, newest first across the selected networks
+SWAP_ROWS = 100
+
+# Longest a page waits for the first swaps of a network
+NETWORK_TIMEOUT_SEC = 8
+
+# Swaps not refreshed for this long are marked stale
+STALE_AFTER_SEC = 3 * REFRESH_INTERVAL_SEC
+
+# A poller nobody read for this long stops querying
+POLLER_IDLE_SEC = 60
+
 EXPLORERS = {
     "mainnet": "etherscan.io",
     "matic": "polygonscan.com",
@@ -15,46 +50,119 @@ EXPLORERS = {
 }
 
 
+TRACE = start_trace("whale-watcher")
 sg = Subgrounds()
-subgraphs = {
-    "mainnet": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-ethereum"
-    ),
-    "matic": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-polygon"
-    ),
-    "optimism": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-optimism"
-    ),
-    "arbitrum_one": sg.load_subgraph(
-        "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-arbitrum"
-    ),
-}
+with section("load_subgraphs"):
+    subgraphs = {
+        "mainnet": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-ethereum"
+        ),
+        "matic": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-polygon"
+        ),
+        "optimism": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-optimism"
+        ),
+        "arbitrum_one": SCHEMAS.load_subgraph(
+            sg, "https://api.thegraph.com/subgraphs/name/messari/uniswap-v3-arbitrum"
+        ),
+    }
+
 
+@traced()
+def fetch_data(network, min_amount=THRESHOLDS[0]):
+    # The feed at the lowest threshold backs every threshold, the ones above
+    # it only need the rows shown
+    size = SWAP_BUFFER_SIZE if min_amount == THRESHOLDS[0] else SWAP_ROWS
+    feed = FEEDS.setdefault((network, min_amount), SwapFeed(size))
+    subgraph = subgraphs[network]
+    where = [subgraph.Swap.amountInUSD >= min_amount]
+    if feed.since() is not None:
+        where.append(subgraph.Swap.timestamp >= feed.since())
 
-def fetch_data(subgraph, amount_in_usd_gte):
     latest_swaps = subgraph.Query.swaps(
-        where=[subgraph.Swap.amountInUSD >= amount_in_usd_gte],
+        where=where,
         orderBy=subgraph.Swap.timestamp,
         orderDirection="desc",
-        first=10,
+        first=feed.size,
     )
-    df = sg.query_df(
-        [
-            latest_swaps.hash,
-            latest_swaps.protocol.name,
-            latest_swaps.protocol.network,
-            latest_swaps.timestamp,
-            latest_swaps.tokenIn.symbol,
-            latest_swaps.amountInUSD,
-            latest_swaps.tokenOut.symbol,
-            latest_swaps.amountOutUSD,
-        ]
+    fieldpaths = [
+        latest_swaps.id,
+        latest_swaps.logIndex,
+        latest_swaps.hash,
+        latest_swaps.protocol.name,
+        latest_swaps.protocol.network,
+        latest_swaps.timestamp,
+        latest_swaps.tokenIn.symbol,
+        latest_swaps.amountInUSD,
+        latest_swaps.tokenOut.symbol,
+        latest_swaps.amountOutUSD,
+    ]
+    df = decode(sg.query_df(fieldpaths), scalars_of("Swap", fieldpaths, DEX_AMM_SCHEMA_PATH))
+
+    df = df[feed.unseen(df["swaps_id"])]
+    if not df.empty:
+        feed.add(df)
+    return feed
+
+
+def subscribe(network, min_amount):
+    return POLLERS.subscribe(
+        (network, min_amount),
+        lambda: fetch_data(network, min_amount),
+        REFRESH_INTERVAL_SEC,
+        POLLER_IDLE_SEC,
     )
+
+
+def fetch_networks(networks, amount_in_usd_gte, timeout=NETWORK_TIMEOUT_SEC):
+    """
+    Swaps of `networks` of at least `amount_in_usd_gte`, from the feeds their
+    pollers publish, as (streams, stale) with one stream of rows per network,
+    newest first. Pollers run concurrently, the page waits up to `timeout`
+    for those that just started. A network that has not answered yet, whose
+    last poll failed or whose swaps are older than STALE_AFTER_SEC
+    contributes the swaps it has and is listed in `stale` as
+    {network: updated_at}, None when it never answered.
+
+    The swaps above a higher threshold are filtered from the buffer of the
+    lowest one, which only reaches back SWAP_BUFFER_SIZE swaps. A network
+    with fewer than SWAP_ROWS of them there is read from a feed queried at
+    that threshold instead, once its poller published it: the buffered rows
+    are shown meanwhile, so changing the threshold never waits on a query.
+    """
+    # One background poller per network queries the subgraph for every
+    # session and threshold, sessions only read what it published
+    topics = {network: subscribe(network, THRESHOLDS[0]) for network in networks}
+
+    deadline = time.monotonic() + timeout
+    streams, stale, short = {}, {}, []
+    for network, topic in topics.items():
+        update = topic.latest(max(0, deadline - time.monotonic()))
+        if update is None or update.value is None:
+            stale[network] = None
+            continue
+
+        if update.error is not None or time.time() - update.updated_at > STALE_AFTER_SEC:
+            stale[network] = update.updated_at
+        streams[network] = update.value.stream(min_amount=amount_in_usd_gte)
+        if amount_in_usd_gte > THRESHOLDS[0] and len(streams[network]) < SWAP_ROWS:
+            short.append(network)
+
+    # Backfill pollers only run while a page shows a threshold the buffer
+    # falls short of, and stop POLLER_IDLE_SEC after. Their first feed shows
+    # up on a later rerun.
+    for network in short:
+        update = subscribe(network, amount_in_usd_gte).latest(0)
+        if update is not None and update.value is not None and update.error is None:
+            streams[network] = update.value.stream()
+
+    return list(streams.values()), stale
+
+
+def format_swaps(df):
     df = df.rename(columns=lambda x: x[len("swaps_") :])
-    df["time"] = df["timestamp"].apply(
-        lambda x: datetime.fromtimestamp(x).strftime("%H:%M:%S")
-    )
+    df["time"] = df["timestamp"].dt.strftime("%H:%M:%S")
     df["dex"] = df["protocol_name"]
     df["network"] = df["protocol_network"]
 
@@ -83,15 +191,26 @@ networks = st.multiselect(
 
 amount_in_usd_gte = st.select_slider(
     "Only display swaps with amount >=",
-    value=100,
-    options=[100, 1000, 10000, 100000],
+    value=THRESHOLDS[0],
+    options=THRESHOLDS,
     key="amount_in_usd_gte",
 )
 
 data_loading = st.text(f"[Every {REFRESH_INTERVAL_SEC} seconds] Loading data...")
-df = pd.concat(
-    map(lambda x: fetch_data(subgraphs[x], amount_in_usd_gte), networks), axis=0
-)
-df = df.sort_values(by=["time"], ascending=False)
+streams, stale = fetch_networks(networks, amount_in_usd_gte)
+# Networks are already sorted by time, merged rather than re-sorted, and only
+# the rows shown are formatted
+rows = merge_newest(streams, SWAP_ROWS)
+if rows:
+    df = format_swaps(pd.DataFrame.from_records([row[3] for row in rows]))
+    df.loc[df["network"].str.lower().isin(stale), "network"] += " (stale)"
+else:
+    df = pd.DataFrame(columns=["time", "dex", "network", "swap", "txn"])
 data_loading.text(f"[Every {REFRESH_INTERVAL_SEC} seconds] Loading data... done!")
+for network, fetched_at in stale.items():
+    since = time.strftime("%H:%M:%S", time.localtime(fetched_at)) if fetched_at else "never"
+    st.warning(f"{network} did not answer in time, last updated: {since}")
 st.markdown(df.to_markdown())
+
+render_trace_panel(TRACE)
+TRACE.finish()
@@ -0,0 +1,117 @@
+import bisect
+import heapq
+import threading
+from collections import deque
+from itertools import islice
+
+import pandas as pd
+
+EPOCH = pd.Timestamp(0)
+SECOND = pd.Timedelta(seconds=1)
+
+
+class SwapFeed:
+    """
+    Most recent swaps of one network, in a fixed-size ring buffer advanced by
+    a high-water mark.
+
+    The cursor is the (timestamp, logIndex) of the newest swap held, so a
+    refresh only asks for swaps from that second on. Several swaps share a
+    second, and the first of them may come back again, so swaps are
+    deduplicated by id before being appended. The oldest swaps drop out once
+    `size` are held.
+
+    The feed is also indexed by amount, so any threshold above the one it is
+    filled at is a bisect of that index rather than another query.
+    Swaps are held as raw records, formatting is left to the page for the
+    rows it shows.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        # (timestamp, logIndex, id, record), oldest first, timestamps in Unix seconds
+        self.rows = deque(maxlen=size)
+        self.ids = set()
+        # (amount, timestamp, logIndex, id, record), ascending
+        self.by_amount = []
+        # min_amount -> rows, newest first, cleared when the buffer changes
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def since(self):
+        """
+        Unix second to fetch swaps from, None until the first fetch.
+        """
+        with self._lock:
+            return self.rows[-1][0] if self.rows else None
+
+    def unseen(self, ids):
+        """
+        Boolean mask of the `ids` not held yet.
+        """
+        with self._lock:
+            return ~ids.isin(self.ids)
+
+    def add(self, swaps):
+        """
+        Appends decoded `swaps`, as Subgrounds names the columns of a `swaps`
+        query selecting at least id, timestamp, logIndex and amountInUSD.
+        """
+        timestamps = ((swaps["swaps_timestamp"] - EPOCH) // SECOND).tolist()
+        keys = zip(timestamps, swaps["swaps_logIndex"].tolist(), swaps["swaps_id"].tolist())
+
+        with self._lock:
+            added = sorted(
+                (*key, record)
+                for key, record in zip(keys, swaps.to_dict("records"))
+                if key[2] not in self.ids
+            )
+            if not added:
+                return
+
+            amount_key = lambda row: (row[3]["swaps_amountInUSD"], *row)
+            if self.rows and added[0][:2] < self.rows[-1][:2]:
+                # A swap older than the newest one held, from the same second,
+                # only now indexed: re-sort rather than append
+                merged = sorted([*self.rows, *added], key=lambda row: row[:2])[-self.size:]
+                self.rows = deque(merged, maxlen=self.size)
+                self.ids = {row[2] for row in merged}
+                self.by_amount = sorted(map(amount_key, merged))
+            else:
+                for row in added:
+                    if len(self.rows) == self.size:
+                        evicted = self.rows[0]
+                        self.ids.discard(evicted[2])
+                        del self.by_amount[bisect.bisect_left(self.by_amount, amount_key(evicted))]
+                    self.rows.append(row)
+                    self.ids.add(row[2])
+                    # Ids are unique, so records are never compared
+                    bisect.insort(self.by_amount, amount_key(row))
+            self._streams.clear()
+
+    def stream(self, min_amount=None):
+        """
+        (timestamp, logIndex, id, record) of the swaps held of at least
+        `min_amount`, newest first. The list is shared by every caller.
+        """
+        with self._lock:
+            if min_amount not in self._streams:
+                start = 0 if min_amount is None else bisect.bisect_left(self.by_amount, (min_amount,))
+                held = (entry[1:] for entry in self.by_amount[start:])
+                self._streams[min_amount] = sorted(held, key=lambda row: row[:2], reverse=True)
+            return self._streams[min_amount]
+
+
+def merge_newest(streams, k):
+    """
+    The `k` newest rows of `streams`, each already sorted newest first, by a
+    lazy heap merge on (timestamp, logIndex): only about k rows are visited
+    rather than every row of every stream.
+    """
+    return list(islice(heapq.merge(*streams, key=lambda row: row[:2], reverse=True), k))
+
+
+# (network, threshold) -> SwapFeed of the swaps of at least that amount. Kept
+# here rather than in the app script, which Streamlit re-executes on every
+# rerun.
+FEEDS = {}
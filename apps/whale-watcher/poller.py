@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import namedtuple
+
+# `value` is the last successful result and `updated_at` when it was fetched
+# (None for both until one succeeded), `error` what the latest attempt raised
+Update = namedtuple("Update", ["value", "updated_at", "error"])
+
+
+class Topic:
+    """
+    Latest update published for one key, with a version readers can wait on.
+    """
+
+    def __init__(self):
+        self.update = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def publish(self, update):
+        with self._changed:
+            self.update = update
+            self.version += 1
+            self._changed.notify_all()
+
+    def latest(self, timeout):
+        """
+        Latest update, waiting up to `timeout` seconds for the first one.
+        None if nothing was published in time.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > 0, timeout)
+            return self.update
+
+
+class Poller(threading.Thread):
+    """
+    Background thread calling `fetch()` every `interval_sec` and publishing
+    each result, or its failure, on `topic`. It stops once nobody read the
+    topic for `idle_sec`.
+    """
+
+    def __init__(self, fetch, interval_sec, idle_sec):
+        super().__init__(daemon=True)
+        self.fetch = fetch
+        self.interval_sec = interval_sec
+        self.idle_sec = idle_sec
+        self.topic = Topic()
+        self.read_at = time.monotonic()
+
+    def run(self):
+        value, updated_at = None, None
+        while time.monotonic() - self.read_at < self.idle_sec:
+            started_at = time.monotonic()
+            try:
+                value, updated_at = self.fetch(), time.time()
+                self.topic.publish(Update(value, updated_at, None))
+            except Exception as exn:
+                self.topic.publish(Update(value, updated_at, exn))
+            time.sleep(max(0, self.interval_sec - (time.monotonic() - started_at)))
+
+
+class PollerRegistry:
+    """
+    One background poller per key for the whole process, whose results every
+    Streamlit session reads instead of querying the subgraph itself.
+
+    Upstream load thus depends on the keys being watched, not on the number of
+    viewers. A poller starts with the first subscriber of its key and stops
+    once no session has read it for `idle_sec`; the next subscriber starts a
+    new one.
+    """
+
+    def __init__(self):
+        self.pollers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, fetch, interval_sec, idle_sec):
+        """
+        Topic the poller of `key` publishes on, starting the poller with
+        `fetch` if none is running.
+        """
+        with self._lock:
+            poller = self.pollers.get(key)
+            if poller is None or not poller.is_alive():
+                poller = Poller(fetch, interval_sec, idle_sec)
+                self.pollers[key] = poller
+                poller.start()
+            poller.read_at = time.monotonic()
+
+        return poller.topic
+
+
+# Kept here rather than in the app script, which Streamlit re-executes on
+# every rerun
+POLLERS = PollerRegistry()